@@ -1,7 +1,12 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import sys
 import os
+import threading
+import uuid
+import hashlib
+from collections import OrderedDict
+from collections.abc import Iterator
 import numpy as np
 import json
 import base64
@@ -31,6 +36,11 @@ sys.path.append(os.path.join(projects_base, '17_eulerian_path'))
 sys.path.append(os.path.join(projects_base, '18_dijkstra_shortest_path'))
 
 # Import all project modules - we'll handle import errors gracefully
+try:
+    from boolean_matrix import BoolMatrix
+except ImportError:
+    BoolMatrix = None
+
 try:
     from relation_to_graph import create_graph_from_matrix
 except ImportError:
@@ -48,15 +58,24 @@ except ImportError:
     boolean_matrix_multiplication = None
 
 try:
-    from relation_power import calculate_all_powers, calculate_transitive_closure
+    from relation_power import (calculate_all_powers, calculate_transitive_closure,
+                                calculate_power, calculate_bounded_closure,
+                                RelationPowerSequence, iter_powers, iter_power_deltas)
 except ImportError:
     calculate_all_powers = None
     calculate_transitive_closure = None
+    calculate_power = None
+    calculate_bounded_closure = None
+    RelationPowerSequence = None
+    iter_powers = None
+    iter_power_deltas = None
 
 try:
     from relation_properties import (check_reflexivity, check_irreflexivity, 
                                     check_symmetry, check_antisymmetry, 
-                                    check_transitivity, check_totality)
+                                    check_transitivity, check_totality,
+                                    RelationAnalysis, randomized_transitivity_check,
+                                    DEFAULT_EPSILON, DEFAULT_ERROR_BOUND)
 except ImportError:
     check_reflexivity = None
     check_irreflexivity = None
@@ -64,6 +83,8 @@ except ImportError:
     check_antisymmetry = None
     check_transitivity = None
     check_totality = None
+    RelationAnalysis = None
+    randomized_transitivity_check = None
 
 try:
     from relation_closures import RelationClosures
@@ -71,9 +92,22 @@ except ImportError:
     RelationClosures = None
 
 try:
-    from relation_composition import RelationComposition
+    from closure_engine import IncrementalClosure, transitive_reduction
+except ImportError:
+    IncrementalClosure = None
+    transitive_reduction = None
+
+try:
+    from reachability_index import ReachabilityIndex
+except ImportError:
+    ReachabilityIndex = None
+
+try:
+    from relation_composition import RelationComposition, RelationCompositionChain, PairRelation
 except ImportError:
     RelationComposition = None
+    RelationCompositionChain = None
+    PairRelation = None
 
 try:
     from graph_visualizer import GraphVisualizer
@@ -120,6 +154,48 @@ except ImportError:
 app = Flask(__name__)
 CORS(app)
 
+# Incremental closure sessions by id; the least recently used one is dropped past the limit
+MAX_GRAPH_SESSIONS = 64
+graph_sessions = OrderedDict()
+graph_sessions_lock = threading.Lock()
+
+# Reachability indexes by relation digest, so repeated queries on one relation build it once
+MAX_REACHABILITY_INDEXES = 16
+reachability_indexes = OrderedDict()
+reachability_indexes_lock = threading.Lock()
+
+def parse_bool_matrix(value, packed=False):
+    """Read a matrix sent as nested lists or in packed BoolMatrix JSON form"""
+    if isinstance(value, dict):
+        return BoolMatrix.from_json(value)
+    if packed:
+        return BoolMatrix.from_dense(value)
+    return np.array(value)
+
+def serialize_bool_matrix(matrix):
+    """Return packed matrices in their JSON form and everything else as lists"""
+    if isinstance(matrix, BoolMatrix):
+        return matrix.to_json()
+    return matrix.tolist()
+
+def lazy_json_response(fields):
+    """JSON object whose callable values are materialized and encoded one at a time
+    
+    Large matrices are turned into lists only while their own field is being
+    encoded, so at most one of them is held as Python lists at once. Iterator
+    values are encoded as arrays one element (matrix row) at a time.
+    """
+    parts = []
+    for key, value in fields.items():
+        if callable(value):
+            value = value()
+        if isinstance(value, Iterator):
+            encoded = '[' + ','.join(json.dumps(item, separators=(",", ":")) for item in value) + ']'
+        else:
+            encoded = json.dumps(value, separators=(",", ":"))
+        parts.append(f'{json.dumps(key)}:{encoded}')
+    return Response('{' + ','.join(parts) + '}', mimetype='application/json')
+
 @app.route('/api/relation-to-graph', methods=['POST'])
 def relation_to_graph():
     try:
@@ -167,8 +243,9 @@ def relation_to_graph():
 def boolean_operations():
     try:
         data = request.json
-        matrix_a = np.array(data['matrixA'])
-        matrix_b = np.array(data['matrixB'])
+        packed = data.get('format') == 'packed'
+        matrix_a = parse_bool_matrix(data['matrixA'], packed)
+        matrix_b = parse_bool_matrix(data['matrixB'], packed)
         
         # Check dimensions
         if matrix_a.shape != matrix_b.shape:
@@ -183,8 +260,8 @@ def boolean_operations():
         
         return jsonify({
             'success': True,
-            'addition': addition.tolist(),
-            'elementwise_and': elementwise_and.tolist()
+            'addition': serialize_bool_matrix(addition),
+            'elementwise_and': serialize_bool_matrix(elementwise_and)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -193,8 +270,9 @@ def boolean_operations():
 def boolean_mult():
     try:
         data = request.json
-        matrix_a = np.array(data['matrixA'])
-        matrix_b = np.array(data['matrixB'])
+        packed = data.get('format') == 'packed'
+        matrix_a = parse_bool_matrix(data['matrixA'], packed)
+        matrix_b = parse_bool_matrix(data['matrixB'], packed)
         
         # Check dimensions
         if matrix_a.shape[1] != matrix_b.shape[0]:
@@ -203,11 +281,11 @@ def boolean_mult():
                 'error': f'Matrix dimensions incompatible: A is {matrix_a.shape}, B is {matrix_b.shape}'
             }), 400
         
-        result = boolean_matrix_multiplication(matrix_a, matrix_b)
+        result = boolean_matrix_multiplication(matrix_a, matrix_b, workers=data.get('workers'))
         
         return jsonify({
             'success': True,
-            'result': result.tolist(),
+            'result': serialize_bool_matrix(result),
             'result_shape': result.shape
         })
     except Exception as e:
@@ -227,7 +305,38 @@ def relation_power():
                 'error': 'Matrix must be square'
             }), 400
         
-        powers = calculate_all_powers(matrix, max_power)
+        # A single (possibly huge) exponent is answered by repeated squaring
+        if data.get('power') is not None:
+            power = int(data['power'])
+            result = {
+                'success': True,
+                'power': power,
+                'result': calculate_power(matrix, power, workers=data.get('workers')).tolist()
+            }
+            if data.get('detectPeriod'):
+                # Index and period come from the relation's structure, not by enumerating powers
+                sequence = RelationPowerSequence(matrix, workers=data.get('workers'))
+                result['index'] = sequence.index
+                result['period'] = sequence.period
+            return jsonify(result)
+        
+        # Pairs reachable within `hops` steps, without downloading every power
+        if data.get('hops') is not None:
+            hops = int(data['hops'])
+            return jsonify({
+                'success': True,
+                'hops': hops,
+                'bounded_closure': calculate_bounded_closure(
+                    matrix, hops, workers=data.get('workers')).tolist()
+            })
+        
+        # Streamed powers are produced one at a time and sent as NDJSON lines
+        if data.get('stream'):
+            return Response(stream_with_context(
+                stream_powers(matrix, max_power, data.get('deltas', True), data.get('workers'))),
+                mimetype='application/x-ndjson')
+        
+        powers = calculate_all_powers(matrix, max_power, workers=data.get('workers'))
         transitive_closure = calculate_transitive_closure(matrix)
         
         return jsonify({
@@ -238,6 +347,19 @@ def relation_power():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+def stream_powers(matrix, max_power, deltas, workers):
+    """NDJSON lines for R¹ … R^maxPower, ending with a summary line"""
+    count = 0
+    if deltas:
+        for k, added, removed in iter_power_deltas(matrix, max_power, workers=workers):
+            count = k
+            yield json.dumps({'power': k, 'added': added.tolist(), 'removed': removed.tolist()}) + '\n'
+    else:
+        for k, power in iter_powers(matrix, max_power, workers=workers):
+            count = k
+            yield json.dumps({'power': k, 'matrix': power.tolist()}) + '\n'
+    yield json.dumps({'done': True, 'powers': count, 'stopped_on_repeat': count < max_power}) + '\n'
+
 @app.route('/api/relation-properties', methods=['POST'])
 def relation_props():
     try:
@@ -251,14 +373,20 @@ def relation_props():
                 'error': 'Matrix must be square'
             }), 400
         
-        properties = {
-            'reflexive': check_reflexivity(matrix),
-            'irreflexive': check_irreflexivity(matrix),
-            'symmetric': check_symmetry(matrix),
-            'antisymmetric': check_antisymmetry(matrix),
-            'transitive': check_transitivity(matrix),
-            'total': check_totality(matrix)
-        }
+        # exact=false trades the full R·R check for a sampled transitivity test. It can
+        # report near-transitive relations (a few defective rows) as transitive: a passed
+        # sample only bounds the defective fraction, see transitivity['guarantee']
+        exact = data.get('exact', True)
+        epsilon = float(data.get('epsilon', DEFAULT_EPSILON))
+        error_bound = float(data.get('errorBound', DEFAULT_ERROR_BOUND))
+        
+        # All six properties in a single vectorized pass
+        if exact:
+            analysis = RelationAnalysis(matrix)
+        else:
+            transitivity = randomized_transitivity_check(matrix, epsilon, error_bound)
+            analysis = RelationAnalysis(matrix, exact=False, transitivity=transitivity)
+        properties = analysis.properties
         
         # Check for special relation types
         relation_types = []
@@ -269,11 +397,25 @@ def relation_props():
         if properties['irreflexive'] and properties['antisymmetric'] and properties['transitive']:
             relation_types.append('Strict Partial Order')
         
-        return jsonify({
+        result = {
             'success': True,
             'properties': properties,
             'relation_types': relation_types
-        })
+        }
+        if not exact:
+            result['transitivity'] = transitivity
+        
+        # Partial orders ship their Hasse diagram: covering edges instead of n² cells. A sampled
+        # check can pass a cyclic relation, so the diagram needs exactly verified properties
+        if exact and ('Partial Order' in relation_types or 'Strict Partial Order' in relation_types):
+            result['hasse_edges'] = transitive_reduction(matrix).tolist()
+        
+        # Counterexamples for the failed properties, reusing the analysis: up to N witnesses
+        # each, with full counts (transitivity is only counted when checked exactly)
+        witness_limit = int(data.get('witnesses', 0))
+        if witness_limit > 0:
+            result['violations'] = analysis.violations(witness_limit)
+        return jsonify(result)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
@@ -285,16 +427,153 @@ def relation_closures():
         
         closures = RelationClosures(matrix)
         
+        # Closures share the packed relation; lists are built only for the response
         reflexive = closures.reflexive_closure()
         symmetric = closures.symmetric_closure()
-        transitive = closures.transitive_closure()
+        # 'powers' squares C ← C ∪ C·C until it stops changing and reports the rounds
+        if data.get('method') == 'powers':
+            transitive = closures.transitive_closure_powers()
+        else:
+            transitive = closures.transitive_closure(workers=data.get('workers'))
+        
+        # Equivalence closure as a class id per element; the n×n matrix only on request,
+        # expanded from the class ids one row at a time while it is encoded
+        classes, equivalence = closures.equivalence_closure()
+        
+        result = {
+            'success': True,
+            'reflexive_closure': reflexive.tolist,
+            'symmetric_closure': symmetric.tolist,
+            'transitive_closure': transitive.tolist,
+            'equivalence_classes': classes,
+            'equivalence_class_count': len(set(classes)),
+            'original_properties': closures.check_properties(closures.relation)
+        }
+        if transitive.rounds is not None:
+            result['transitive_closure_rounds'] = transitive.rounds
+        if data.get('equivalenceMatrix'):
+            result['equivalence_closure'] = equivalence.rows()
+        return lazy_json_response(result)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+def get_graph_session(session_id):
+    """Look up a session and mark it as recently used; returns (closure, session lock)"""
+    with graph_sessions_lock:
+        if session_id not in graph_sessions:
+            raise ValueError(f"Unknown graph session '{session_id}'")
+        graph_sessions.move_to_end(session_id)
+        return graph_sessions[session_id]
+
+@app.route('/api/graph-sessions', methods=['POST'])
+def create_graph_session():
+    try:
+        data = request.json
+        if 'matrix' in data:
+            session = RelationClosures(data['matrix']).incremental_closure()
+        else:
+            session = IncrementalClosure(int(data['size']))
+        
+        session_id = uuid.uuid4().hex
+        with graph_sessions_lock:
+            # Each session has its own lock, so a long insert only blocks that session
+            graph_sessions[session_id] = (session, threading.Lock())
+            while len(graph_sessions) > MAX_GRAPH_SESSIONS:
+                graph_sessions.popitem(last=False)
+        
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'size': session.size,
+            'closure_pairs': session.closure.popcount()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/graph-sessions/<session_id>/pairs', methods=['POST'])
+def insert_graph_session_pairs(session_id):
+    try:
+        data = request.json
+        session, lock = get_graph_session(session_id)
+        
+        # Batched insert: one restricted Warshall pass over the new endpoints
+        with lock:
+            added = session.insert_many(data['pairs'])
+            total = session.closure.popcount()
         
         return jsonify({
             'success': True,
-            'reflexive_closure': reflexive,
-            'symmetric_closure': symmetric,
-            'transitive_closure': transitive,
-            'original_properties': closures.check_properties(matrix)
+            'added_pairs': added,
+            'closure_pairs': total
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/graph-sessions/<session_id>/reachable', methods=['POST'])
+def graph_session_reachable(session_id):
+    try:
+        data = request.json
+        session, lock = get_graph_session(session_id)
+        # Reads take the session lock too, so they never see a half-applied insert
+        with lock:
+            reachable = session.reaches(int(data['source']), int(data['target']))
+        return jsonify({
+            'success': True,
+            'reachable': reachable
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/graph-sessions/<session_id>/closure', methods=['GET'])
+def graph_session_closure(session_id):
+    try:
+        session, lock = get_graph_session(session_id)
+        with lock:
+            closure = session.closure.copy()
+        if request.args.get('format') != 'packed':
+            closure = closure.to_dense()
+        return jsonify({
+            'success': True,
+            'closure': serialize_bool_matrix(closure)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/graph-sessions/<session_id>', methods=['DELETE'])
+def delete_graph_session(session_id):
+    with graph_sessions_lock:
+        removed = graph_sessions.pop(session_id, None) is not None
+    return jsonify({'success': removed})
+
+def get_reachability_index(relation):
+    """Cached ReachabilityIndex for a packed relation, built on first use"""
+    digest = hashlib.blake2b(relation.words.tobytes(), digest_size=16)
+    digest.update(f'{relation.rows}x{relation.cols}'.encode())
+    key = digest.hexdigest()
+    with reachability_indexes_lock:
+        if key in reachability_indexes:
+            reachability_indexes.move_to_end(key)
+            return reachability_indexes[key]
+    index = ReachabilityIndex(relation)
+    with reachability_indexes_lock:
+        reachability_indexes[key] = index
+        while len(reachability_indexes) > MAX_REACHABILITY_INDEXES:
+            reachability_indexes.popitem(last=False)
+    return index
+
+@app.route('/api/reachability/query', methods=['POST'])
+def reachability_query():
+    try:
+        data = request.json
+        relation = parse_bool_matrix(data['matrix'], packed=True)
+        index = get_reachability_index(relation)
+        
+        # R* by default; strict=true answers (a,b) ∈ R⁺ instead
+        reflexive = not data.get('strict', False)
+        return jsonify({
+            'success': True,
+            'reachable': index.query(data['pairs'], reflexive),
+            'index': index.stats()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -303,13 +582,31 @@ def relation_closures():
 def relation_composition():
     try:
         data = request.json
+        
+        # Label-keyed input: lists of [a, b] pairs, joined on the middle labels
+        if 'pairsR' in data:
+            comp = RelationComposition(PairRelation.from_pairs(map(tuple, data['pairsR'])),
+                                       PairRelation.from_pairs(map(tuple, data['pairsS'])))
+            result = comp.compose()
+            return jsonify({
+                'success': True,
+                'composition_pairs': comp.get_relation_pairs(result),
+                'sizes': {'R': len(comp.R), 'S': len(comp.S), 'RoS': len(result)}
+            })
+        
         matrix_r = data['matrixR']
         matrix_s = data['matrixS']
         
         comp = RelationComposition(matrix_r, matrix_s)
-        result = comp.compose()
         
-        return jsonify({
+        # explain=true adds, for each pair of RoS, an intermediate element (-1 elsewhere)
+        explain = data.get('explain', False)
+        if explain:
+            result, witnesses = comp.compose_with_witness()
+        else:
+            result = comp.compose()
+        
+        response = {
             'success': True,
             'composition': result,
             'dimensions': {
@@ -317,6 +614,32 @@ def relation_composition():
                 'S': f'{len(matrix_s)}×{len(matrix_s[0])}',
                 'RoS': f'{len(result)}×{len(result[0])}'
             }
+        }
+        if explain:
+            response['witnesses'] = witnesses
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/relation-composition-chain', methods=['POST'])
+def relation_composition_chain():
+    try:
+        data = request.json
+        matrices = data['matrices']
+        
+        chain = RelationCompositionChain(matrices)
+        estimated_cost, split = chain.optimal_order()
+        result = chain.compose()
+        
+        return jsonify({
+            'success': True,
+            'composition': result,
+            'order': chain.parenthesization(split),
+            'estimated_cost': estimated_cost,
+            'dimensions': {
+                'chain': [f'{a}×{b}' for a, b in zip(chain.dims, chain.dims[1:])],
+                'result': f'{chain.dims[0]}×{chain.dims[-1]}'
+            }
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Benchmark the boolean product kernels to locate the M4RM crossover
+
+Usage:
+    python benchmarks/boolean_product_benchmark.py
+    python benchmarks/boolean_product_benchmark.py --sizes 1024 2048 4096 --density 0.3
+
+Sizes default to n = 1k … 32k. The largest sizes need several GB of memory
+for the tiled BLAS kernel; pass --sizes to limit the sweep on small machines.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects'))
+from boolean_matrix import BoolMatrix
+from boolean_product import boolean_product
+
+
+def time_method(A, B, method, repeat):
+    """Best wall time of `repeat` runs of one kernel"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        boolean_product(A, B, method)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Boolean product kernel benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1024, 2048, 4096, 8192, 16384, 32768])
+    parser.add_argument('--density', type=float, default=0.5)
+    parser.add_argument('--methods', nargs='+', default=['blocked', 'm4rm'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"density = {args.density}")
+    print(f"{'n':>8} " + " ".join(f"{m:>12}" for m in args.methods) + f" {'fastest':>10}")
+
+    for n in args.sizes:
+        A = BoolMatrix.from_dense(rng.random((n, n)) < args.density)
+        B = BoolMatrix.from_dense(rng.random((n, n)) < args.density)
+        timings = {method: time_method(A, B, method, args.repeat) for method in args.methods}
+        fastest = min(timings, key=timings.get)
+        print(f"{n:>8} " + " ".join(f"{timings[m]:>11.3f}s" for m in args.methods) + f" {fastest:>10}")
+
+
+if __name__ == "__main__":
+    main()
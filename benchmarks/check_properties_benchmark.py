@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Benchmark RelationClosures.check_properties against the old nested-loop version
+
+Usage:
+    python benchmarks/check_properties_benchmark.py
+    python benchmarks/check_properties_benchmark.py --sizes 500 2000 --legacy-max 500
+
+Two relations are timed per size: a total order (transitive, so the whole
+R·R has to be checked) and a random relation (fails on the first block).
+The loop version is O(n³) Python iterations and is only run up to
+--legacy-max; larger sizes print '-' in its column.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects',
+                             '7_8_9_relation_closures'))
+from relation_closures import RelationClosures
+
+
+def legacy_check_properties(matrix, n):
+    """The nested-loop implementation check_properties used to have"""
+    properties = {'reflexive': True, 'symmetric': True, 'transitive': True, 'antisymmetric': True}
+    for i in range(n):
+        if matrix[i][i] != 1:
+            properties['reflexive'] = False
+            break
+    for i in range(n):
+        for j in range(n):
+            if matrix[i][j] == 1:
+                if matrix[j][i] != 1:
+                    properties['symmetric'] = False
+                if i != j and matrix[j][i] == 1:
+                    properties['antisymmetric'] = False
+    for i in range(n):
+        for j in range(n):
+            for k in range(n):
+                if matrix[i][j] == 1 and matrix[j][k] == 1:
+                    if matrix[i][k] != 1:
+                        properties['transitive'] = False
+                        break
+    return properties
+
+
+def best_time(function, repeat):
+    """Best wall time of `repeat` calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="check_properties benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 8000])
+    parser.add_argument('--density', type=float, default=0.1)
+    parser.add_argument('--legacy-max', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'n':>6} {'relation':>12} {'vectorized':>12} {'loops':>12} {'speedup':>9}")
+
+    for n in args.sizes:
+        relations = {
+            'total order': np.triu(np.ones((n, n), dtype=int)),
+            'random': (rng.random((n, n)) < args.density).astype(int)
+        }
+        for name, dense in relations.items():
+            matrix = dense.tolist()
+            closures = RelationClosures(matrix)
+            fast = best_time(lambda: closures.check_properties(matrix), args.repeat)
+            if n <= args.legacy_max:
+                slow = best_time(lambda: legacy_check_properties(matrix, n), 1)
+                print(f"{n:>6} {name:>12} {fast:>11.3f}s {slow:>11.3f}s {slow / fast:>8.0f}x")
+            else:
+                print(f"{n:>6} {name:>12} {fast:>11.3f}s {'-':>12} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Scaling benchmark for the blocked Floyd–Warshall closure on a process pool
+
+Usage:
+    python benchmarks/closure_scaling_benchmark.py
+    python benchmarks/closure_scaling_benchmark.py --size 20480 --workers 1 2 4 8 16
+
+Closes one random relation with the single-process Warshall engine and with
+the blocked engine at each worker count, and reports the speedup over one
+blocked worker. Workers default to powers of two up to the CPU count.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects'))
+from boolean_matrix import BoolMatrix
+from closure_engine import CLOSURE_TILE, blocked_closure_words, warshall_closure_words
+
+
+def default_workers():
+    """1, 2, 4, ... up to the CPU count (which is always included)"""
+    cpus = os.cpu_count() or 1
+    counts = []
+    workers = 1
+    while workers < cpus:
+        counts.append(workers)
+        workers *= 2
+    return counts + [cpus]
+
+
+def time_closure(words, function, *args):
+    """Wall time of closing a fresh copy of the words"""
+    copy = words.copy()
+    start = time.perf_counter()
+    function(copy, *args)
+    return time.perf_counter() - start, copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blocked closure scaling benchmark")
+    parser.add_argument('--size', type=int, default=8192)
+    parser.add_argument('--density', type=float, default=0.0002)
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers())
+    parser.add_argument('--tile', type=int, default=CLOSURE_TILE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    relation = BoolMatrix.from_dense(rng.random((args.size, args.size)) < args.density)
+    print(f"n = {args.size}, density = {args.density}, tile = {args.tile}")
+
+    baseline, expected = time_closure(relation.words, warshall_closure_words)
+    print(f"{'warshall':>10} {baseline:>10.2f}s")
+
+    single = None
+    for workers in args.workers:
+        elapsed, result = time_closure(relation.words, blocked_closure_words, workers, args.tile)
+        if not np.array_equal(result, expected):
+            raise RuntimeError(f"Blocked closure with {workers} workers disagrees with Warshall")
+        single = single or elapsed
+        print(f"{workers:>7} wk {elapsed:>10.2f}s {single / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
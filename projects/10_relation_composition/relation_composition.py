@@ -1,14 +1,134 @@
 #!/usr/bin/env python3
 """Calculate composition of two relations RoS"""
 
-from typing import List, Tuple
+from typing import Hashable, Iterable, List, Sequence, Tuple
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from boolean_product import boolean_product, boolean_product_with_witness
+from sparse_boolean import SparseBoolMatrix, sparse_boolean_product
+
+
+def label_array(labels) -> np.ndarray:
+    """1-D object array of the labels themselves, so no label is coerced to a common dtype"""
+    if isinstance(labels, np.ndarray) and labels.dtype == object and labels.ndim == 1:
+        return labels
+    labels = list(labels)
+    return np.fromiter(labels, dtype=object, count=len(labels))
+
+
+def encode_labels(labels, domain=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Dictionary-encode labels to int ids; returns (ids, domain)
+    
+    Without a domain the distinct labels become the domain in order of first
+    occurrence. With one, ids follow its order and unknown labels raise
+    ValueError. Labels are compared as Python objects, so 1 and '1' stay
+    distinct and any hashable value (None, tuples, mixed types) can be used.
+    """
+    labels = list(labels)
+    if domain is None:
+        index = {}
+        ids = np.fromiter((index.setdefault(label, len(index)) for label in labels),
+                          dtype=np.int64, count=len(labels))
+        return ids, label_array(index)
+    domain = label_array(domain)
+    ids = lookup_labels(domain, labels)
+    if len(ids) and ids.min() < 0:
+        missing = labels[int(np.argmin(ids))]
+        raise ValueError(f"Label {missing!r} is not in the domain")
+    return ids, domain
+
+
+def lookup_labels(domain: np.ndarray, labels) -> np.ndarray:
+    """Position of every label in `domain`, or -1, by a dict lookup"""
+    index = {label: position for position, label in enumerate(domain.tolist())}
+    labels = labels.tolist() if isinstance(labels, np.ndarray) else list(labels)
+    return np.fromiter((index.get(label, -1) for label in labels), dtype=np.int64, count=len(labels))
+
+
+class PairRelation:
+    """Relation between labelled sets stored as sorted (source id, target id) arrays
+    
+    Labels are dictionary-encoded into `domain` and `codomain`; pairs are
+    sorted by source id then target id with duplicates removed, so a relation
+    costs O(|R|) memory regardless of the size of the sets.
+    """
+    
+    __slots__ = ('sources', 'targets', 'domain', 'codomain')
+    
+    def __init__(self, sources, targets, domain: Sequence[Hashable], codomain: Sequence[Hashable],
+                 presorted: bool = False):
+        """Wrap encoded pairs; they are sorted and deduplicated unless `presorted` says they already are"""
+        self.domain = label_array(domain)
+        self.codomain = label_array(codomain)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if not presorted and len(sources):
+            width = max(len(self.codomain), 1)
+            keys = np.sort(sources * width + targets)
+            keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+            sources, targets = np.divmod(keys, width)
+        self.sources = sources
+        self.targets = targets
+    
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[Hashable, Hashable]],
+                   domain=None, codomain=None) -> 'PairRelation':
+        """Build from (a, b) label pairs; domains default to the labels that occur"""
+        pairs = list(pairs)
+        left = [a for a, _ in pairs]
+        right = [b for _, b in pairs]
+        sources, domain = encode_labels(left, domain)
+        targets, codomain = encode_labels(right, codomain)
+        return cls(sources, targets, domain, codomain)
+    
+    @classmethod
+    def from_matrix(cls, matrix, domain: Sequence[Hashable], codomain: Sequence[Hashable]) -> 'PairRelation':
+        """Build from a positional 0/1 matrix whose rows and columns carry the given labels"""
+        sources, targets = np.nonzero(np.asarray(matrix))
+        return cls(sources, targets, domain, codomain)
+    
+    def __len__(self) -> int:
+        return len(self.sources)
+    
+    def to_sparse(self) -> SparseBoolMatrix:
+        """Positional CSR form over (domain × codomain)"""
+        return SparseBoolMatrix.from_pairs(self.sources, self.targets,
+                                           (len(self.domain), len(self.codomain)))
+    
+    def pairs(self) -> List[Tuple[Hashable, Hashable]]:
+        """Ordered (a, b) label pairs"""
+        return list(zip(self.domain[self.sources].tolist(), self.codomain[self.targets].tolist()))
+    
+    def compose(self, other: 'PairRelation') -> 'PairRelation':
+        """RoS joined on the shared middle labels
+        
+        The middle labels of R are matched to the domain of S by a dict
+        lookup, pairs whose middle element S does not know are dropped, and
+        the join itself is the output-sensitive CSR product: each (a, b) is
+        expanded into S's targets of b and the (a, c) keys are deduplicated.
+        No |A|×|C| matrix is built.
+        """
+        middle = lookup_labels(other.domain, self.codomain)[self.targets]
+        keep = middle >= 0
+        left = SparseBoolMatrix.from_pairs(self.sources[keep], middle[keep],
+                                           (len(self.domain), len(other.domain)))
+        joined = sparse_boolean_product(left, other.to_sparse())
+        # CSR output is already sorted by (row, column) and duplicate-free
+        return PairRelation(joined.row_ids(), joined.indices, self.domain, other.codomain, presorted=True)
+    
+    def __repr__(self) -> str:
+        return f"PairRelation({len(self.domain)}→{len(self.codomain)}, {len(self)} pairs)"
 
 
 class RelationComposition:
     """Class to calculate composition of two relations"""
     
     def __init__(self, matrix_R: List[List[int]], matrix_S: List[List[int]]):
-        """Initialize with matrices for relations R and S"""
+        """Initialize with matrices for relations R and S (lists, SparseBoolMatrix or PairRelation)"""
         self.R = matrix_R
         self.S = matrix_S
         self.validate_matrices()
@@ -19,6 +139,21 @@ class RelationComposition:
         # S: B → C (n × p matrix)
         # RoS: A → C (m × p matrix)
         
+        if isinstance(self.R, PairRelation) or isinstance(self.S, PairRelation):
+            if not (isinstance(self.R, PairRelation) and isinstance(self.S, PairRelation)):
+                raise ValueError("Labelled relations can only be composed with labelled relations")
+            self.m, self.n, self.p = len(self.R.domain), len(self.R.codomain), len(self.S.codomain)
+            return
+        
+        if isinstance(self.R, SparseBoolMatrix) or isinstance(self.S, SparseBoolMatrix):
+            self.R = SparseBoolMatrix.coerce(self.R)
+            self.S = SparseBoolMatrix.coerce(self.S)
+            self.m, self.n = self.R.shape
+            if self.S.shape[0] != self.n:
+                raise ValueError(f"Matrix S must have {self.n} rows to compose with R")
+            self.p = self.S.shape[1]
+            return
+        
         self.m = len(self.R)  # rows of R
         if self.m == 0:
             raise ValueError("Matrix R is empty")
@@ -41,31 +176,159 @@ class RelationComposition:
             if len(row) != self.p:
                 raise ValueError("Matrix S is not rectangular")
     
+    def is_sparse(self) -> bool:
+        """True when the relations are held in CSR form"""
+        return isinstance(self.R, SparseBoolMatrix)
+    
+    def is_labelled(self) -> bool:
+        """True when the relations are label-keyed PairRelations"""
+        return isinstance(self.R, PairRelation)
+    
     def compose(self) -> List[List[int]]:
         """Calculate RoS composition"""
         # RoS[i][j] = 1 if there exists k such that R[i][k] = 1 and S[k][j] = 1
+        # The product engine measures the nnz of R and S and switches to the
+        # sparse CSR product for low-density relations
         
-        RoS = [[0] * self.p for _ in range(self.m)]
+        if self.is_labelled():
+            return self.R.compose(self.S)
+        if self.is_sparse():
+            return boolean_product(self.R, self.S)
         
-        for i in range(self.m):
-            for j in range(self.p):
-                # Check if there exists intermediate element k
-                for k in range(self.n):
-                    if self.R[i][k] == 1 and self.S[k][j] == 1:
-                        RoS[i][j] = 1
-                        break  # Found one path, that's enough
+        R = np.array(self.R, dtype=int).reshape(self.m, self.n)
+        S = np.array(self.S, dtype=int).reshape(self.n, self.p)
+        return boolean_product(R, S).astype(int).tolist()
+    
+    def compose_with_witness(self) -> Tuple[List[List[int]], List[List[int]]]:
+        """Calculate RoS and, for each pair (a,c) in it, an intermediate b
         
-        return RoS
+        Returns (RoS, witness) where witness[i][j] is the index of some b with
+        (a_i,b) ∈ R and (b,c_j) ∈ S, or -1 if (a_i,c_j) ∉ RoS. Both come out
+        of one packed pass, so explaining the composition needs no rescan.
+        """
+        if self.is_sparse():
+            R, S = self.R, self.S
+        else:
+            R = np.array(self.R, dtype=int).reshape(self.m, self.n)
+            S = np.array(self.S, dtype=int).reshape(self.n, self.p)
+        product, witness = boolean_product_with_witness(R, S)
+        return product.tolist(), witness.tolist()
     
     def get_relation_pairs(self, matrix: List[List[int]], 
-                          set_A: List[str], set_B: List[str]) -> List[Tuple[str, str]]:
+                          set_A: List[str] = None, set_B: List[str] = None) -> List[Tuple[str, str]]:
         """Get ordered pairs from relation matrix"""
-        pairs = []
-        for i in range(len(matrix)):
-            for j in range(len(matrix[0])):
-                if matrix[i][j] == 1:
-                    pairs.append((set_A[i], set_B[j]))
-        return pairs
+        # Labelled and CSR relations already hold only their pairs
+        if isinstance(matrix, PairRelation):
+            return matrix.pairs()
+        if isinstance(matrix, SparseBoolMatrix):
+            rows, cols = matrix.row_ids(), matrix.indices
+        else:
+            rows, cols = np.nonzero(np.asarray(matrix) == 1)
+        return [(set_A[i], set_B[j]) for i, j in zip(rows.tolist(), cols.tolist())]
+
+
+class RelationCompositionChain:
+    """Compose a chain R1 o R2 o ... o Rk in the cheapest evaluation order"""
+    
+    # Dense kernels process 64 cells per word operation
+    DENSE_WORD_CELLS = 64
+    
+    def __init__(self, matrices: List[List[List[int]]]):
+        """Initialize with the chain of relation matrices (lists or SparseBoolMatrix)"""
+        if not matrices:
+            raise ValueError("Chain must contain at least one relation")
+        self.matrices = [m if isinstance(m, SparseBoolMatrix) else np.array(m, dtype=int)
+                         for m in matrices]
+        self.validate_chain()
+        self.densities = [self.measure_density(m) for m in self.matrices]
+    
+    def validate_chain(self):
+        """Validate that every neighbouring pair of relations can be composed"""
+        for index, matrix in enumerate(self.matrices):
+            if len(matrix.shape) != 2:
+                raise ValueError(f"Matrix R{index + 1} is not rectangular")
+        for index in range(len(self.matrices) - 1):
+            cols = self.matrices[index].shape[1]
+            rows = self.matrices[index + 1].shape[0]
+            if cols != rows:
+                raise ValueError(f"Matrix R{index + 2} must have {cols} rows to compose with R{index + 1}")
+        # dims[i], dims[i + 1] are the shape of relation i
+        self.dims = [self.matrices[0].shape[0]] + [m.shape[1] for m in self.matrices]
+    
+    @staticmethod
+    def measure_density(matrix) -> float:
+        """Fraction of pairs present in a relation"""
+        cells = matrix.shape[0] * matrix.shape[1]
+        if cells == 0:
+            return 0.0
+        nnz = matrix.nnz if isinstance(matrix, SparseBoolMatrix) else np.count_nonzero(matrix)
+        return nnz / cells
+    
+    def product_estimate(self, m: int, n: int, p: int,
+                         density_a: float, density_b: float) -> Tuple[float, float]:
+        """Estimated (cost, result density) of an m×n by n×p boolean product
+        
+        The cost is the cheaper of the dense word-level kernels (m·n·p / 64)
+        and the sparse product (expected number of (i, k, j) paths). The
+        result density assumes independently placed pairs.
+        """
+        dense_cost = m * n * p / self.DENSE_WORD_CELLS
+        sparse_cost = m * n * p * density_a * density_b
+        result_density = 1.0 - (1.0 - density_a * density_b) ** n
+        return min(dense_cost, sparse_cost), result_density
+    
+    def optimal_order(self) -> Tuple[float, List[List[int]]]:
+        """Dynamic programming over sub-chains; returns (total cost, split table)"""
+        k = len(self.matrices)
+        cost = [[0.0] * k for _ in range(k)]
+        density = [[0.0] * k for _ in range(k)]
+        split = [[0] * k for _ in range(k)]
+        for i in range(k):
+            density[i][i] = self.densities[i]
+        
+        for length in range(2, k + 1):
+            for i in range(k - length + 1):
+                j = i + length - 1
+                cost[i][j] = float('inf')
+                for s in range(i, j):
+                    step, result_density = self.product_estimate(
+                        self.dims[i], self.dims[s + 1], self.dims[j + 1],
+                        density[i][s], density[s + 1][j])
+                    total = cost[i][s] + cost[s + 1][j] + step
+                    if total < cost[i][j]:
+                        cost[i][j] = total
+                        density[i][j] = result_density
+                        split[i][j] = s
+        
+        return cost[0][k - 1], split
+    
+    def parenthesization(self, split: List[List[int]] = None) -> str:
+        """Evaluation order as a string such as ((R1oR2)oR3)"""
+        if split is None:
+            split = self.optimal_order()[1]
+        
+        def render(i: int, j: int) -> str:
+            if i == j:
+                return f"R{i + 1}"
+            s = split[i][j]
+            return f"({render(i, s)}o{render(s + 1, j)})"
+        
+        return render(0, len(self.matrices) - 1)
+    
+    def compose(self) -> List[List[int]]:
+        """Calculate R1 o R2 o ... o Rk in the optimal order"""
+        _, split = self.optimal_order()
+        
+        def evaluate(i: int, j: int):
+            if i == j:
+                return self.matrices[i]
+            s = split[i][j]
+            return boolean_product(evaluate(i, s), evaluate(s + 1, j))
+        
+        result = evaluate(0, len(self.matrices) - 1)
+        if isinstance(result, SparseBoolMatrix):
+            return result
+        return (np.asarray(result) != 0).astype(int).tolist()
 
 
 def print_matrix(matrix: List[List[int]], title: str, 
@@ -149,7 +412,7 @@ def main():
     print_matrix(matrix_S1, "Matrix S (B → C)", set_B, set_C)
     
     comp1 = RelationComposition(matrix_R1, matrix_S1)
-    RoS1 = comp1.compose()
+    RoS1, witness1 = comp1.compose_with_witness()
     
     print_matrix(RoS1, "Matrix RoS (A → C)", set_A, set_C)
     
@@ -163,16 +426,14 @@ def main():
     print_relation_info(S_pairs, "S")
     print_relation_info(RoS_pairs, "RoS")
     
-    # Explain composition
+    # Explain composition with the intermediate element found during composition
     print("\nComposition explanation:")
     for i, a in enumerate(set_A):
         for j, c in enumerate(set_C):
-            if RoS1[i][j] == 1:
-                # Find intermediate element
-                for k, b in enumerate(set_B):
-                    if matrix_R1[i][k] == 1 and matrix_S1[k][j] == 1:
-                        print(f"  ({a},{c}) ∈ RoS because ({a},{b}) ∈ R and ({b},{c}) ∈ S")
-                        break
+            k = witness1[i][j]
+            if k >= 0:
+                b = set_B[k]
+                print(f"  ({a},{c}) ∈ RoS because ({a},{b}) ∈ R and ({b},{c}) ∈ S")
     
     # Example 2: Identity relation
     print("\n" + "=" * 60)
@@ -1,5 +1,9 @@
 import numpy as np
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from boolean_matrix import BoolMatrix
 
 def get_matrix_dimensions(matrix_name):
     """Get matrix dimensions from user input with guidance on compatibility"""
@@ -76,11 +80,11 @@ def boolean_matrix_addition(A, B):
     if A.shape != B.shape:
         raise ValueError("Matrices must have the same dimensions for addition")
     
-    # Convert to numpy arrays and ensure boolean type
-    A = np.array(A, dtype=bool)
-    B = np.array(B, dtype=bool)
+    # Packed matrices are combined word by word and stay packed
+    if isinstance(A, BoolMatrix) or isinstance(B, BoolMatrix):
+        return BoolMatrix.coerce(A) | BoolMatrix.coerce(B)
     
-    # Perform OR operation
+    # logical_or treats any non-zero value as True, so no bool copies are needed
     result = np.logical_or(A, B)
     return result.astype(int)
 
@@ -88,8 +92,8 @@ def boolean_matrix_elementwise_and(A, B):
     """Perform element-wise Boolean AND operation"""
     if A.shape != B.shape:
         raise ValueError("Matrices must have the same dimensions for element-wise AND")
-    A = np.array(A, dtype=bool)
-    B = np.array(B, dtype=bool)
+    if isinstance(A, BoolMatrix) or isinstance(B, BoolMatrix):
+        return BoolMatrix.coerce(A) & BoolMatrix.coerce(B)
     result = np.logical_and(A, B)
     return result.astype(int)
 
@@ -1,5 +1,10 @@
 import numpy as np
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from boolean_matrix import BoolMatrix
+from boolean_product import boolean_product
 
 def get_matrix_dimensions(matrix_name):
     """Get matrix dimensions from user input with guidance on compatibility"""
@@ -72,25 +77,16 @@ def display_matrix(matrix, name="Matrix"):
     for i in range(rows):
         print(f"{i}: " + " ".join([f"{int(val)}" for val in matrix[i]]))
 
-def boolean_matrix_multiplication(A, B):
+def boolean_matrix_multiplication(A, B, method='auto', workers=None):
     """Perform Boolean matrix multiplication (A ⊙ B)"""
     if A.shape[1] != B.shape[0]:
         raise ValueError("Matrix dimensions are not compatible for multiplication")
     
-    # Convert to numpy arrays and ensure boolean type
-    A = np.array(A, dtype=bool)
-    B = np.array(B, dtype=bool)
-    
-    result = np.zeros((A.shape[0], B.shape[1]), dtype=int)
-    for i in range(A.shape[0]):
-        for j in range(B.shape[1]):
-            # For each element (i, j) in the result, check if there exists a k
-            # such that A[i, k] ⊙ B[k, j] = 1 (i.e., A[i, k] and B[k, j] are both 1)
-            for k in range(A.shape[1]):
-                if A[i, k] and B[k, j]:
-                    result[i, j] = 1
-                    break  # Once we find a 1, we can stop checking other k values
-    return result
+    # The engine picks matmul, tiled, bitset or M4RM kernels from the shapes and density
+    result = boolean_product(A, B, method, workers)
+    if isinstance(result, BoolMatrix):
+        return result
+    return result.astype(int)
 
 def save_results_to_file(matrix_a, matrix_b, product):
     """Save the matrix multiplication results to a file"""
@@ -1,5 +1,14 @@
 import numpy as np
 import os
+import sys
+import math
+import hashlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from boolean_matrix import BoolMatrix, unpack_rows
+from boolean_product import boolean_product
+from closure_engine import strongly_connected_components, transitive_closure
+from sparse_boolean import SparseBoolMatrix
 
 def get_matrix_dimensions():
     """Get square matrix dimensions from user input"""
@@ -75,47 +84,212 @@ def get_power_n():
         except ValueError:
             print("Error: Please enter a valid integer.")
 
-def boolean_matrix_multiplication(A, B):
+def boolean_matrix_multiplication(A, B, method='auto', workers=None):
     """Perform Boolean matrix multiplication"""
-    # Convert to numpy arrays and ensure boolean type
-    A = np.array(A, dtype=bool)
-    B = np.array(B, dtype=bool)
-    
-    result = np.zeros(A.shape, dtype=int)
-    for i in range(A.shape[0]):
-        for j in range(A.shape[1]):
-            # For each element (i,j), we need to check if there exists a k
-            # where A[i,k] AND B[k,j] is 1
-            for k in range(A.shape[0]):
-                if A[i, k] and B[k, j]:
-                    result[i, j] = 1
-                    break  # Once we find a 1, we can stop checking other k values
-    return result
+    # Shared engine; method selects 'matmul', 'blocked', 'bitset' or 'm4rm'
+    return boolean_product(A, B, method, workers).astype(int)
 
-def calculate_all_powers(R, max_n):
+def calculate_all_powers(R, max_n, method='auto', workers=None):
     """Calculate R¹, R², R³, ..., R^n"""
     powers = [R.copy()]  # R¹ is just R
     
     current_power = R.copy()
     for i in range(2, max_n + 1):
-        current_power = boolean_matrix_multiplication(current_power, R)
+        current_power = boolean_matrix_multiplication(current_power, R, method, workers)
         powers.append(current_power.copy())
     
     return powers
 
-def calculate_transitive_closure(R):
-    """Calculate R^∞ (transitive closure) using Warshall's algorithm"""
-    size = R.shape[0]
-    result = R.copy()
+def packed_power(base, n, method='auto', workers=None):
+    """R^n of a packed relation by repeated squaring (⌈log₂ n⌉ squarings)"""
+    if n < 0:
+        raise ValueError("Power must be a non-negative integer")
+    result = BoolMatrix.identity(base.rows)
     
-    # Warshall's algorithm for transitive closure
-    for k in range(size):
-        for i in range(size):
-            for j in range(size):
-                result[i, j] = result[i, j] or (result[i, k] and result[k, j])
+    # Binary exponentiation: square the base, multiply it in for every set bit of n
+    while n:
+        if n & 1:
+            result = boolean_product(result, base, method, workers)
+        n >>= 1
+        if n:
+            base = boolean_product(base, base, method, workers)
     
     return result
 
+def calculate_power(R, n, method='auto', workers=None):
+    """Calculate a single R^n by repeated squaring (⌈log₂ n⌉ squarings)"""
+    return packed_power(BoolMatrix.from_dense(R), n, method, workers).to_dense()
+
+def calculate_bounded_closure(R, k, method='auto', workers=None):
+    """Calculate R^{≤k} = R ∪ R² ∪ ... ∪ R^k ("reachable within k steps")
+    
+    Walks the bits of k from the most significant one, using
+    R^{≤2m} = R^{≤m} ∪ R^m·R^{≤m} to double and R^{≤m+1} = R ∪ R·R^{≤m}
+    to step, so only O(log k) boolean products are needed. Stops early once
+    the union stops growing, since it then equals the transitive closure.
+    """
+    if k < 1:
+        raise ValueError("Number of steps must be a positive integer")
+    base = BoolMatrix.from_dense(R)
+    union = base
+    power = base
+    
+    for bit in bin(k)[3:]:
+        doubled = union | boolean_product(power, union, method, workers)
+        if doubled == union:
+            break
+        union = doubled
+        power = boolean_product(power, power, method, workers)
+        if bit == '1':
+            stepped = base | boolean_product(base, union, method, workers)
+            if stepped == union:
+                break
+            union = stepped
+            power = boolean_product(power, base, method, workers)
+    
+    return union.to_dense()
+
+def _bfs_levels(graph, roots):
+    """BFS depth of every node from the given roots (-1 where unreached), one frontier per step"""
+    levels = np.full(graph.rows, -1, dtype=np.int64)
+    levels[roots] = 0
+    frontier = np.asarray(roots, dtype=np.int64)
+    depth = 0
+    while len(frontier):
+        depth += 1
+        starts = graph.indptr[frontier]
+        lengths = graph.indptr[frontier + 1] - starts
+        # Positions of every out-edge of the frontier in graph.indices
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        targets = np.unique(graph.indices[np.repeat(starts, lengths) + offsets])
+        frontier = targets[levels[targets] < 0]
+        levels[frontier] = depth
+    return levels
+
+def relation_period(R):
+    """Period of the sequence R, R², R³, ... read off the relation's structure
+    
+    The period is the lcm, over the strongly connected components that
+    contain a cycle, of the gcd of their cycle lengths (1 if there are
+    none). A component's gcd is the gcd of ℓ(u) + 1 - ℓ(v) over its edges
+    u → v, with ℓ the BFS depth from any of its nodes.
+    """
+    graph = SparseBoolMatrix.coerce(R)
+    _, labels = strongly_connected_components(graph)
+    src = graph.row_ids()
+    dst = graph.indices
+    inner = labels[src] == labels[dst]
+    if not inner.any():
+        return 1
+    src, dst = src[inner], dst[inner]
+    # One BFS over the intra-component edges, rooted at a node of every cyclic component
+    components, roots = np.unique(labels[src], return_index=True)
+    inner_graph = SparseBoolMatrix.from_pairs(src, dst, graph.shape)
+    levels = _bfs_levels(inner_graph, src[roots])
+    
+    order = np.argsort(labels[src], kind='stable')
+    gaps = np.abs(levels[src] + 1 - levels[dst])[order]
+    starts = np.searchsorted(labels[src][order], components)
+    return math.lcm(*np.gcd.reduceat(gaps, starts).tolist())
+
+class RelationPowerSequence:
+    """The sequence R¹, R², R³, ... which is eventually periodic for boolean R
+    
+    R^(k + period) = R^k for every k ≥ index. The period comes from the
+    relation's components (relation_period), and the index is the smallest
+    k with R^k · R^period = R^k, found by doubling and then bisecting k.
+    Only O(log² index + log period) products are needed and no powers are
+    stored, so any later R^n is a reduced exponent and one repeated squaring.
+    """
+    
+    def __init__(self, R, method='auto', workers=None):
+        """Find the index and period of the powers of R"""
+        self.base = BoolMatrix.from_dense(R)
+        self.size = self.base.rows
+        self.method = method
+        self.workers = workers
+        self.period = relation_period(self.base)
+        
+        cycle = packed_power(self.base, self.period, method, workers)
+        
+        def repeats(power):
+            return boolean_product(power, cycle, method, workers) == power
+        
+        # Double k until R^k repeats, then bisect between the last two k
+        low, high = 0, 1
+        current = self.base
+        while not repeats(current):
+            low, high = high, 2 * high
+            current = boolean_product(current, current, method, workers)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if repeats(packed_power(self.base, middle, method, workers)):
+                high = middle
+            else:
+                low = middle
+        self.index = high
+    
+    def power(self, n) -> BoolMatrix:
+        """R^n for any n ≥ 1, with n reduced into [1, index + period) first"""
+        if n < 1:
+            raise ValueError("Power must be a positive integer")
+        if n >= self.index:
+            n = self.index + (n - self.index) % self.period
+        return packed_power(self.base, n, self.method, self.workers)
+
+def iter_powers(R, max_n=None, method='auto', workers=None):
+    """Lazily yield (k, R^k) for k = 1, 2, ... as packed BoolMatrix values
+    
+    Stops after max_n powers, or as soon as a power equals an earlier one:
+    from there on the sequence only cycles. Only the current power and one
+    128-bit digest per power are kept in memory.
+    """
+    base = BoolMatrix.from_dense(R)
+    current = base
+    seen = set()
+    k = 1
+    while max_n is None or k <= max_n:
+        digest = hashlib.blake2b(current.words.tobytes(), digest_size=16).digest()
+        if digest in seen:
+            return
+        seen.add(digest)
+        yield k, current
+        current = boolean_product(current, base, method, workers)
+        k += 1
+
+def _set_cells(words, cols, row_block=1024):
+    """(row, column) index pairs of the set bits of packed words, as an (m × 2) array"""
+    rows = np.flatnonzero(words.any(axis=1))
+    cells = [np.zeros((0, 2), dtype=int)]
+    for start in range(0, len(rows), row_block):
+        block = rows[start:start + row_block]
+        r, c = np.nonzero(unpack_rows(words[block], cols))
+        cells.append(np.column_stack((block[r], c)))
+    return np.concatenate(cells)
+
+def iter_power_deltas(R, max_n=None, method='auto', workers=None):
+    """Yield (k, added, removed) where added/removed are the cells that changed from R^(k-1)
+    
+    The first delta lists every pair of R itself. Each cell list is an (m × 2)
+    array of (row, column) indices.
+    """
+    previous = None
+    for k, current in iter_powers(R, max_n, method, workers):
+        if previous is None:
+            changed = current.words
+        else:
+            changed = previous.words ^ current.words
+        added = _set_cells(changed & current.words, current.cols)
+        removed = (_set_cells(changed & previous.words, current.cols)
+                   if previous is not None else np.zeros((0, 2), dtype=int))
+        yield k, added, removed
+        previous = current
+
+def calculate_transitive_closure(R):
+    """Calculate R^∞ (transitive closure) using Warshall's algorithm"""
+    # Bitset Warshall: each pivot ORs row k into every row that reaches k
+    return transitive_closure(R)
+
 def display_matrix(matrix, name="Matrix", elements=None):
     """Display a matrix with proper formatting and element labels"""
     print(f"\n{name}:")
@@ -1,5 +1,20 @@
 import numpy as np
 import os
+import sys
+import math
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from boolean_matrix import BoolMatrix, unpack_rows
+from closure_engine import transitive_reduction
+from transitivity import (TRANSITIVITY_ROW_BLOCK, block_product, block_product_operand,
+                          first_intransitive_block)
+
+# Defaults for the randomized checks: detect a defect in at least EPSILON of
+# the rows with probability at least 1 - ERROR_BOUND
+DEFAULT_EPSILON = 0.01
+DEFAULT_ERROR_BOUND = 1e-6
+# Witnesses returned per failed property unless a limit is given
+DEFAULT_WITNESS_LIMIT = 10
 
 def get_matrix_dimensions():
     """Get square matrix dimensions from user input"""
@@ -99,8 +114,10 @@ def check_antisymmetry(R):
                 return False
     return True
 
-def check_transitivity(R):
+def check_transitivity(R, exact=True, epsilon=DEFAULT_EPSILON, error_bound=DEFAULT_ERROR_BOUND):
     """Check if relation is transitive: ∀x,y,z: (x,y) ∈ R ∧ (y,z) ∈ R ⟹ (x,z) ∈ R"""
+    if not exact:
+        return randomized_transitivity_check(R, epsilon, error_bound)['transitive']
     size = R.shape[0]
     for i in range(size):
         for j in range(size):
@@ -118,6 +135,307 @@ def check_totality(R):
                 return False
     return True
 
+def sample_size(size, epsilon, error_bound):
+    """Rows to sample so a defect in ≥ epsilon of the rows is missed with probability ≤ error_bound"""
+    if not 0 < epsilon <= 1 or not 0 < error_bound < 1:
+        raise ValueError("epsilon must be in (0, 1] and error_bound in (0, 1)")
+    return min(size, math.ceil(math.log(1 / error_bound) / epsilon))
+
+def _sampled_rows(size, epsilon, error_bound, seed):
+    """Random row sample, or every row when the sample would cover them all"""
+    count = sample_size(size, epsilon, error_bound)
+    if count == size:
+        return np.arange(size)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(size, size=count, replace=False))
+
+def _sampling_guarantee(holds, rows_checked, size, epsilon, error_bound):
+    """Fewer than epsilon of the rows defective, with probability 1 - error_bound; None if exact"""
+    if not holds or rows_checked == size:
+        return None
+    return {'rows_defective_below': epsilon, 'with_probability': 1.0 - error_bound}
+
+def randomized_transitivity_check(R, epsilon=DEFAULT_EPSILON, error_bound=DEFAULT_ERROR_BOUND, seed=None):
+    """Sampled-row transitivity test: False is always correct, True only holds within 'guarantee'"""
+    P = BoolMatrix.coerce(R)
+    rows = _sampled_rows(P.rows, epsilon, error_bound, seed)
+    method, operand = block_product_operand(P)
+    transitive = True
+    for start in range(0, len(rows), TRANSITIVITY_ROW_BLOCK):
+        sample = BoolMatrix(P.words[rows[start:start + TRANSITIVITY_ROW_BLOCK]],
+                            len(rows[start:start + TRANSITIVITY_ROW_BLOCK]), P.cols)
+        if (block_product(sample, method, operand) & ~sample).any():
+            transitive = False
+            break
+    return {
+        'transitive': transitive,
+        'guarantee': _sampling_guarantee(transitive, len(rows), P.rows, epsilon, error_bound),
+        'rows_checked': int(len(rows))
+    }
+
+def randomized_closure_check(R, C, epsilon=DEFAULT_EPSILON, error_bound=DEFAULT_ERROR_BOUND, seed=None):
+    """Sampled-row test that C is the transitive closure of R, with the same one-sided 'guarantee'"""
+    P = BoolMatrix.coerce(R)
+    Q = BoolMatrix.coerce(C)
+    if P.shape != Q.shape:
+        return {'equal': False, 'guarantee': None, 'rows_checked': 0}
+    rows = _sampled_rows(P.rows, epsilon, error_bound, seed)
+    
+    reach = BoolMatrix(P.words[rows], len(rows), P.cols)
+    frontier = reach
+    method, operand = block_product_operand(P, len(rows))
+    while frontier.any():
+        frontier = block_product(frontier, method, operand) & ~reach
+        reach = reach | frontier
+    
+    equal = reach == BoolMatrix(Q.words[rows], len(rows), Q.cols)
+    return {
+        'equal': equal,
+        'guarantee': _sampling_guarantee(equal, len(rows), P.rows, epsilon, error_bound),
+        'rows_checked': int(len(rows))
+    }
+
+def _first_pairs(mask, limit, row_offset=0, upper_only=False):
+    """Up to `limit` (i, j) cells of a packed mask, unpacking only the rows that are needed"""
+    pairs = []
+    for i in np.flatnonzero(mask.words.any(axis=1)):
+        cols = np.flatnonzero(unpack_rows(mask.words[i:i + 1], mask.cols)[0])
+        if upper_only:
+            cols = cols[cols > i + row_offset]
+        pairs.extend((int(i) + row_offset, int(j)) for j in cols[:limit - len(pairs)])
+        if len(pairs) >= limit:
+            break
+    return pairs
+
+def symmetry_violations(R, limit=DEFAULT_WITNESS_LIMIT, transpose=None):
+    """Pairs (x,y) ∈ R with (y,x) ∉ R: R ∧ ¬Rᵀ, counted in full and sampled up to `limit`"""
+    P = BoolMatrix.coerce(R)
+    mask = P & ~(P.T if transpose is None else transpose)
+    return {'count': mask.popcount(), 'witnesses': _first_pairs(mask, limit)}
+
+def antisymmetry_violations(R, limit=DEFAULT_WITNESS_LIMIT, mutual=None):
+    """Unordered pairs x < y with both (x,y) and (y,x) in R: the off-diagonal part of R ∧ Rᵀ"""
+    P = BoolMatrix.coerce(R)
+    mask = P & P.T if mutual is None else mutual
+    diagonal = int(np.count_nonzero(P.diagonal()))
+    return {'count': (mask.popcount() - diagonal) // 2,
+            'witnesses': _first_pairs(mask, limit, upper_only=True)}
+
+def transitivity_violations(R, limit=DEFAULT_WITNESS_LIMIT, row_block=TRANSITIVITY_ROW_BLOCK,
+                            start_row=0, count=True, transpose=None):
+    """Pairs (x,z) ∉ R reachable in two steps: (R·R) ∧ ¬R, computed in row blocks
+    
+    'count' is the number of such (x,z) pairs. Each witness is a triple
+    (x, y, z) whose middle element comes from the first bit of R_x ∧ Rᵀ_z.
+    Rows before `start_row` are known to be clean and skipped; with
+    count=False the scan stops once `limit` witnesses are found and 'count'
+    is None.
+    """
+    P = BoolMatrix.coerce(R)
+    PT = transpose
+    method, operand = block_product_operand(P, row_block)
+    total = 0
+    witnesses = []
+    for start in range(start_row, P.rows, row_block):
+        if not count and len(witnesses) >= limit:
+            break
+        rows = P.row_block(start, start + row_block)
+        mask = block_product(rows, method, operand) & ~rows
+        total += mask.popcount()
+        if len(witnesses) < limit and mask.any():
+            if PT is None:
+                PT = P.T
+            for x, z in _first_pairs(mask, limit - len(witnesses), row_offset=start):
+                middle = unpack_rows(P.words[x:x + 1] & PT.words[z:z + 1], P.cols)[0]
+                witnesses.append((x, int(np.argmax(middle)), z))
+    return {'count': total if count else None, 'witnesses': witnesses}
+
+class RelationAnalysis:
+    """All six properties of a relation and the packed intermediates behind them
+    
+    The diagonal, Rᵀ, R∧Rᵀ and R∨Rᵀ are computed once on packed rows; the
+    transitivity product runs in row blocks and stops at the first block with
+    a pair of R·R missing from R. With exact=False transitivity is decided by
+    randomized_transitivity_check instead, or taken from its precomputed
+    `transitivity` result. violations() reuses all of this.
+    """
+    
+    def __init__(self, R, exact=True, epsilon=DEFAULT_EPSILON, error_bound=DEFAULT_ERROR_BOUND,
+                 transitivity=None):
+        self.P = BoolMatrix.coerce(R)
+        self.PT = self.P.T
+        self.mutual = self.P & self.PT          # pairs with both (x,y) and (y,x)
+        self.exact = exact
+        size = self.P.rows
+        diagonal_count = int(np.count_nonzero(self.P.diagonal()))
+        pair_count = self.P.popcount()
+        mutual_count = self.mutual.popcount()
+        covered_count = (self.P | self.PT).popcount()     # pairs with (x,y) or (y,x)
+        
+        # Rows before the first failing block are known to be transitive
+        self.intransitive_from = None
+        if exact:
+            self.intransitive_from = first_intransitive_block(self.P)
+            transitive = self.intransitive_from is None
+        else:
+            if transitivity is None:
+                transitivity = randomized_transitivity_check(self.P, epsilon, error_bound)
+            transitive = transitivity['transitive']
+        
+        self.properties = {
+            'reflexive': diagonal_count == size,
+            'irreflexive': diagonal_count == 0,
+            'symmetric': mutual_count == pair_count,
+            'antisymmetric': mutual_count == diagonal_count,
+            'transitive': transitive,
+            'total': covered_count - diagonal_count == size * size - size
+        }
+    
+    def violations(self, limit=DEFAULT_WITNESS_LIMIT):
+        """Violation counts and up to `limit` witnesses for the failed pair/triple properties
+        
+        Transitivity is counted in full only when it was checked exactly;
+        after a sampled check the scan stops at `limit` witnesses.
+        """
+        violations = {}
+        if not self.properties['symmetric']:
+            violations['symmetric'] = symmetry_violations(self.P, limit, transpose=self.PT)
+        if not self.properties['antisymmetric']:
+            violations['antisymmetric'] = antisymmetry_violations(self.P, limit, mutual=self.mutual)
+        if not self.properties['transitive']:
+            violations['transitive'] = transitivity_violations(
+                self.P, limit, start_row=self.intransitive_from or 0, count=self.exact,
+                transpose=self.PT)
+        return violations
+
+def find_violations(R, limit=DEFAULT_WITNESS_LIMIT):
+    """Violation counts and up to `limit` witnesses for every failed pair/triple property"""
+    return RelationAnalysis(R).violations(limit)
+
+def analyze_relation(R, exact=True, epsilon=DEFAULT_EPSILON, error_bound=DEFAULT_ERROR_BOUND,
+                     transitivity=None):
+    """Check all six properties in one vectorized pass over shared intermediates
+    
+    Returns the same dict as calling check_reflexivity … check_totality one
+    by one; see RelationAnalysis.
+    """
+    return RelationAnalysis(R, exact, epsilon, error_bound, transitivity).properties
+
+class RelationPropertyTracker:
+    """Relation with property counters kept up to date under single-pair edits
+    
+    Counters maintained:
+    - pairs, diagonal:  number of pairs and of (x,x) pairs
+    - mutual:           ordered off-diagonal pairs (x,y) with (y,x) also in R
+    - covered:          unordered pairs {x,y}, x ≠ y, with (x,y) or (y,x) in R
+    - paths[x,z]:       number of y with (x,y), (y,z) ∈ R
+    - violations:       pairs (x,z) ∉ R with paths[x,z] > 0
+    
+    An edit to (a,b) changes paths only in row a and column b, so add and
+    remove cost O(n) and every property answer is O(1).
+    """
+    
+    def __init__(self, R):
+        """Start tracking a square 0/1 matrix (or an empty relation on R elements if R is an int)"""
+        if isinstance(R, (int, np.integer)):
+            R = np.zeros((R, R), dtype=bool)
+        matrix = np.asarray(R) != 0
+        if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError("Matrix must be square")
+        self.size = matrix.shape[0]
+        self.matrix = matrix.copy()
+        
+        as_float = self.matrix.astype(np.float32)
+        self.paths = np.rint(as_float @ as_float).astype(np.int64)
+        self.pairs = int(np.count_nonzero(self.matrix))
+        self.diagonal = int(np.count_nonzero(self.matrix.diagonal()))
+        self.mutual = int(np.count_nonzero(self.matrix & self.matrix.T)) - self.diagonal
+        self.covered = (int(np.count_nonzero(self.matrix | self.matrix.T)) - self.diagonal) // 2
+        self.violations = int(np.count_nonzero((self.paths > 0) & ~self.matrix))
+    
+    def _violations_through(self, a, b):
+        """Violations lying in row a or column b"""
+        row = np.count_nonzero((self.paths[a] > 0) & ~self.matrix[a])
+        col = np.count_nonzero((self.paths[:, b] > 0) & ~self.matrix[:, b])
+        overlap = self.paths[a, b] > 0 and not self.matrix[a, b]
+        return int(row + col - overlap)
+    
+    def _update_paths(self, a, b, sign):
+        """Add or remove the paths x→a→b and a→b→z that use the edge (a,b) once, and a→a→a for a loop"""
+        self.paths[a] += sign * self.matrix[b]
+        self.paths[:, b] += sign * self.matrix[:, a]
+        if a == b:
+            self.paths[a, a] += sign
+    
+    def _check_pair(self, a, b):
+        if not (0 <= a < self.size and 0 <= b < self.size):
+            raise ValueError(f"Pair ({a}, {b}) is out of range for a relation on {self.size} elements")
+    
+    def _set(self, a, b, value):
+        """Set cell (a,b) and adjust every counter; returns False if nothing changed"""
+        self._check_pair(a, b)
+        if self.matrix[a, b] == value:
+            return False
+        sign = 1 if value else -1
+        before = self._violations_through(a, b)
+        
+        if a == b:
+            self.diagonal += sign
+        else:
+            if self.matrix[b, a]:
+                self.mutual += 2 * sign
+            else:
+                self.covered += sign
+        self.pairs += sign
+        
+        # Path updates read the relation without (a,b) in both directions
+        if value:
+            self._update_paths(a, b, sign)
+            self.matrix[a, b] = True
+        else:
+            self.matrix[a, b] = False
+            self._update_paths(a, b, sign)
+        
+        self.violations += self._violations_through(a, b) - before
+        return True
+    
+    def add(self, a, b):
+        """Insert the pair (a,b); returns False if it was already present"""
+        return self._set(a, b, True)
+    
+    def remove(self, a, b):
+        """Delete the pair (a,b); returns False if it was not present"""
+        return self._set(a, b, False)
+    
+    def is_reflexive(self):
+        return self.diagonal == self.size
+    
+    def is_irreflexive(self):
+        return self.diagonal == 0
+    
+    def is_symmetric(self):
+        return self.mutual == self.pairs - self.diagonal
+    
+    def is_antisymmetric(self):
+        return self.mutual == 0
+    
+    def is_transitive(self):
+        return self.violations == 0
+    
+    def is_total(self):
+        return self.covered == self.size * (self.size - 1) // 2
+    
+    def properties(self):
+        """Same dict as analyze_relation, read from the counters"""
+        return {
+            'reflexive': self.is_reflexive(),
+            'irreflexive': self.is_irreflexive(),
+            'symmetric': self.is_symmetric(),
+            'antisymmetric': self.is_antisymmetric(),
+            'transitive': self.is_transitive(),
+            'total': self.is_total()
+        }
+
 def display_matrix(matrix, elements=None):
     """Display a matrix with proper formatting and element labels"""
     print("\nRelation Matrix R:")
@@ -212,20 +530,11 @@ def display_results(R, elements):
     print("   A relation is transitive if (x,y) ∈ R and (y,z) ∈ R implies (x,z) ∈ R")
     if not transitive:
         print("   Triples breaking transitivity:")
-        count = 0
-        for i in range(size):
-            for j in range(size):
-                for k in range(size):
-                    if R[i, j] == 1 and R[j, k] == 1 and R[i, k] == 0:
-                        print(f"   ({elements[i]},{elements[j]}) ∈ R and ({elements[j]},{elements[k]}) ∈ R but ({elements[i]},{elements[k]}) ∉ R")
-                        count += 1
-                        if count >= 5:  # Limit examples to avoid overwhelming output
-                            print("   (additional examples omitted)")
-                            break
-                if count >= 5:
-                    break
-            if count >= 5:
-                break
+        violations = transitivity_violations(R, limit=5)  # Limit examples to avoid overwhelming output
+        for i, j, k in violations['witnesses']:
+            print(f"   ({elements[i]},{elements[j]}) ∈ R and ({elements[j]},{elements[k]}) ∈ R but ({elements[i]},{elements[k]}) ∉ R")
+        if violations['count'] > len(violations['witnesses']):
+            print(f"   (additional examples omitted, {violations['count']} missing pairs in total)")
     
     # Check totality
     total = check_totality(R)
@@ -245,6 +554,12 @@ def display_results(R, elements):
         print("This relation is a:")
         for rtype in relation_types:
             print(f"- {rtype}")
+        
+        # Partial orders are fully described by their covering pairs
+        if "Partial order" in relation_types or "Strict partial order" in relation_types:
+            edges = transitive_reduction(R)
+            print("\nHasse diagram (covering pairs):")
+            print("   " + ", ".join(f"({elements[x]},{elements[y]})" for x, y in edges))
     else:
         print("\n=== Relation Classification ===")
         print("This relation doesn't match any common relation type.")
@@ -1,8 +1,96 @@
 #!/usr/bin/env python3
 """Calculate reflexive, symmetric, and transitive closures of a relation"""
 
-from typing import List, Tuple
-import copy
+from typing import Iterator, List, Optional, Tuple, Union
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from boolean_matrix import BoolMatrix, unpack_rows
+from boolean_product import boolean_product
+from closure_engine import (transitive_closure, equivalence_classes, equivalence_matrix,
+                            IncrementalClosure, column_mask)
+from reachability_index import ReachabilityIndex
+from transitivity import is_transitive_packed
+
+
+class ClosureResult:
+    """Closure stored as a shared packed relation plus the overlay that was added
+    
+    overlay is None (the base is the closure itself), 'diagonal' (base ∪ I)
+    or 'transpose' (base ∪ Rᵀ). The base words are never modified, so the
+    reflexive and symmetric closures share the original relation's buffer;
+    nested lists are only built by tolist() at the API boundary.
+    """
+    
+    __slots__ = ('base', 'overlay', 'rounds')
+    
+    def __init__(self, base: BoolMatrix, overlay: Optional[str] = None, rounds: Optional[int] = None):
+        self.base = base
+        self.overlay = overlay
+        self.rounds = rounds    # boolean products used, for iterative closures
+    
+    def __len__(self) -> int:
+        return self.base.rows
+    
+    def _row(self, i: int) -> np.ndarray:
+        """Row i of base ∪ overlay as a bool array"""
+        row = unpack_rows(self.base.words[i:i + 1], self.base.cols)[0]
+        if self.overlay == 'diagonal':
+            row[i] = True
+        elif self.overlay == 'transpose':
+            row |= column_mask(self.base.words, i)
+        return row
+    
+    def __getitem__(self, i: int) -> List[int]:
+        """Row i as a list of 0/1 ints, for code that indexes matrix[i][j]"""
+        return self._row(i).astype(int).tolist()
+    
+    def to_bool_matrix(self) -> BoolMatrix:
+        """Materialize base ∪ overlay as a new packed matrix"""
+        if self.overlay == 'diagonal':
+            return self.base | BoolMatrix.identity(self.base.rows)
+        if self.overlay == 'transpose':
+            return self.base | self.base.T
+        return self.base
+    
+    def tolist(self) -> List[List[int]]:
+        return self.to_bool_matrix().tolist()
+
+
+class EquivalenceClosure:
+    """Equivalence relation x ~ y ⟺ labels[x] == labels[y], kept as its class labels
+    
+    Rows are derived from the label array when they are read, so the n×n
+    matrix is only built by to_bool_matrix() or tolist().
+    """
+    
+    __slots__ = ('labels',)
+    
+    def __init__(self, labels: np.ndarray):
+        self.labels = np.asarray(labels)
+    
+    def __len__(self) -> int:
+        return len(self.labels)
+    
+    def __getitem__(self, i: int) -> List[int]:
+        """Row i as a list of 0/1 ints, for code that indexes matrix[i][j]"""
+        return (self.labels == self.labels[i]).astype(int).tolist()
+    
+    def rows(self) -> Iterator[List[int]]:
+        """Rows one at a time, for streaming the matrix out"""
+        return (self[i] for i in range(len(self)))
+    
+    def to_bool_matrix(self) -> BoolMatrix:
+        return equivalence_matrix(self.labels)
+    
+    def tolist(self) -> List[List[int]]:
+        return self.to_bool_matrix().tolist()
+
+
+Matrix = Union[List[List[int]], BoolMatrix, ClosureResult, EquivalenceClosure]
 
 
 class RelationClosures:
@@ -13,6 +101,8 @@ class RelationClosures:
         self.original_matrix = matrix
         self.n = len(matrix)
         self.validate_matrix()
+        # Packed once; every closure result shares or derives from these words
+        self.relation = BoolMatrix.from_dense(np.array(matrix, dtype=np.uint8).reshape(self.n, self.n))
     
     def validate_matrix(self):
         """Validate that matrix is square"""
@@ -20,104 +110,94 @@ class RelationClosures:
             if len(row) != self.n:
                 raise ValueError("Matrix must be square")
     
-    def reflexive_closure(self) -> List[List[int]]:
+    def packed(self, matrix: Matrix) -> BoolMatrix:
+        """Packed form of a nested list, BoolMatrix, ClosureResult or EquivalenceClosure"""
+        if isinstance(matrix, (ClosureResult, EquivalenceClosure)):
+            return matrix.to_bool_matrix()
+        if isinstance(matrix, BoolMatrix):
+            return matrix
+        return BoolMatrix.from_dense(np.array(matrix, dtype=int).reshape(self.n, self.n))
+    
+    def reflexive_closure(self) -> ClosureResult:
         """Calculate reflexive closure by adding diagonal elements"""
-        result = copy.deepcopy(self.original_matrix)
-        
-        # Add all diagonal elements (a,a) for all a
-        for i in range(self.n):
-            result[i][i] = 1
-        
-        return result
+        # Add all diagonal elements (a,a) for all a, as an overlay on the shared relation
+        return ClosureResult(self.relation, 'diagonal')
     
-    def symmetric_closure(self) -> List[List[int]]:
+    def symmetric_closure(self) -> ClosureResult:
         """Calculate symmetric closure by adding reverse of each relation"""
-        result = copy.deepcopy(self.original_matrix)
-        
-        # If (a,b) exists, add (b,a)
-        for i in range(self.n):
-            for j in range(self.n):
-                if self.original_matrix[i][j] == 1:
-                    result[j][i] = 1
-        
-        return result
+        # If (a,b) exists, add (b,a): Rᵀ overlaid on the shared relation
+        return ClosureResult(self.relation, 'transpose')
     
-    def transitive_closure(self) -> List[List[int]]:
+    def transitive_closure(self, workers: int = None) -> ClosureResult:
         """Calculate transitive closure using Warshall's algorithm"""
-        result = copy.deepcopy(self.original_matrix)
-        
-        # Warshall's algorithm
-        for k in range(self.n):
-            for i in range(self.n):
-                for j in range(self.n):
-                    # If there's a path from i to k and from k to j, add path from i to j
-                    result[i][j] = result[i][j] or (result[i][k] and result[k][j])
-        
-        return result
+        # Shared bitset Warshall engine; large dense relations go to the
+        # blocked Floyd–Warshall engine on `workers` processes
+        return ClosureResult(transitive_closure(self.relation, workers=workers))
     
-    def matrix_multiply_boolean(self, A: List[List[int]], B: List[List[int]]) -> List[List[int]]:
-        """Boolean matrix multiplication for relation composition"""
-        result = [[0] * self.n for _ in range(self.n)]
+    def incremental_closure(self) -> IncrementalClosure:
+        """Transitive closure object that absorbs later pair insertions without a rerun"""
+        return IncrementalClosure(self.relation)
+    
+    def reachability_index(self) -> ReachabilityIndex:
+        """Index answering (a,b) ∈ R* point queries without materializing the closure"""
+        return ReachabilityIndex(self.relation)
+    
+    def equivalence_closure(self) -> Tuple[List[int], EquivalenceClosure]:
+        """Smallest equivalence relation containing R, via union-find
         
-        for i in range(self.n):
-            for j in range(self.n):
-                for k in range(self.n):
-                    if A[i][k] == 1 and B[k][j] == 1:
-                        result[i][j] = 1
-                        break
+        Returns the class id of every element and the equivalence relation,
+        whose rows are only expanded from those ids when read.
+        """
+        labels = equivalence_classes(self.relation)
+        return labels.tolist(), EquivalenceClosure(labels)
+    
+    def matrix_multiply_boolean(self, A: List[List[int]], B: List[List[int]],
+                                workers: int = None) -> List[List[int]]:
+        """Boolean matrix multiplication for relation composition"""
+        # Output rows are split across `workers` threads by the shared product engine
+        product = boolean_product(np.array(A, dtype=int).reshape(self.n, self.n),
+                                  np.array(B, dtype=int).reshape(self.n, self.n),
+                                  workers=workers)
+        return product.astype(int).tolist()
+    
+    def transitive_closure_powers(self) -> ClosureResult:
+        """Alternative: Calculate transitive closure by repeated squaring
         
-        return result
+        C ← C ∪ C·C doubles the path length covered each round, so the loop
+        stops after at most ⌈log₂ n⌉ + 1 products, as soon as C stops
+        changing. The number of products is kept in the result's `rounds`.
+        """
+        closure = self.relation
+        rounds = 0
+        while True:
+            squared = closure | boolean_product(closure, closure)
+            rounds += 1
+            if squared == closure:
+                break
+            closure = squared
+        return ClosureResult(closure, rounds=rounds)
     
-    def transitive_closure_powers(self) -> List[List[int]]:
-        """Alternative: Calculate transitive closure using matrix powers"""
-        result = copy.deepcopy(self.original_matrix)
-        power = copy.deepcopy(self.original_matrix)
+    def check_properties(self, matrix: Matrix) -> dict:
+        """Check if relation has reflexive, symmetric, transitive properties
         
-        # Calculate R ∪ R² ∪ R³ ∪ ... ∪ R^n
-        for _ in range(self.n - 1):
-            power = self.matrix_multiply_boolean(power, self.original_matrix)
-            # Add to result (union)
-            for i in range(self.n):
-                for j in range(self.n):
-                    result[i][j] = result[i][j] or power[i][j]
+        Works on packed rows: the diagonal and R∧Rᵀ give reflexivity,
+        symmetry and antisymmetry in one pass, and R·R ⊆ R is tested in row
+        blocks that stop at the first block containing a violation.
+        """
+        P = self.packed(matrix)
+        diagonal = int(np.count_nonzero(P.diagonal()))
+        pair_count = P.popcount()
+        mutual_count = (P & P.T).popcount()     # pairs with both (x,y) and (y,x)
         
-        return result
-    
-    def check_properties(self, matrix: List[List[int]]) -> dict:
-        """Check if relation has reflexive, symmetric, transitive properties"""
         properties = {
-            'reflexive': True,
-            'symmetric': True,
-            'transitive': True,
-            'antisymmetric': True,
+            'reflexive': diagonal == self.n,
+            'symmetric': mutual_count == pair_count,
+            'transitive': is_transitive_packed(P),
+            'antisymmetric': mutual_count == diagonal,
             'equivalence': False,
             'partial_order': False
         }
         
-        # Check reflexive
-        for i in range(self.n):
-            if matrix[i][i] != 1:
-                properties['reflexive'] = False
-                break
-        
-        # Check symmetric and antisymmetric
-        for i in range(self.n):
-            for j in range(self.n):
-                if matrix[i][j] == 1:
-                    if matrix[j][i] != 1:
-                        properties['symmetric'] = False
-                    if i != j and matrix[j][i] == 1:
-                        properties['antisymmetric'] = False
-        
-        # Check transitive
-        for i in range(self.n):
-            for j in range(self.n):
-                for k in range(self.n):
-                    if matrix[i][j] == 1 and matrix[j][k] == 1:
-                        if matrix[i][k] != 1:
-                            properties['transitive'] = False
-                            break
-        
         # Check for equivalence relation
         properties['equivalence'] = (properties['reflexive'] and 
                                     properties['symmetric'] and 
@@ -130,28 +210,22 @@ class RelationClosures:
         
         return properties
     
-    def get_relation_pairs(self, matrix: List[List[int]]) -> List[Tuple[int, int]]:
+    def get_relation_pairs(self, matrix: Matrix) -> List[Tuple[int, int]]:
         """Get ordered pairs from relation matrix"""
-        pairs = []
-        for i in range(self.n):
-            for j in range(self.n):
-                if matrix[i][j] == 1:
-                    pairs.append((i, j))
-        return pairs
-    
-    def count_added_pairs(self, original: List[List[int]], closure: List[List[int]]) -> int:
+        # Set bits of the packed form, in row-major order
+        rows, cols = self.packed(matrix).nonzero()
+        return list(zip(rows.tolist(), cols.tolist()))
+    
+    def count_added_pairs(self, original: Matrix, closure: Matrix) -> int:
         """Count how many pairs were added to form closure"""
-        count = 0
-        for i in range(self.n):
-            for j in range(self.n):
-                if closure[i][j] == 1 and original[i][j] == 0:
-                    count += 1
-        return count
+        return (self.packed(closure) & ~self.packed(original)).popcount()
 
 
-def print_matrix(matrix: List[List[int]], title: str, elements: List[str] = None):
+def print_matrix(matrix: Matrix, title: str, elements: List[str] = None):
     """Print matrix with title"""
-    n = len(matrix)
+    if isinstance(matrix, (ClosureResult, EquivalenceClosure)):
+        matrix = matrix.to_bool_matrix()
+    n = matrix.rows if isinstance(matrix, BoolMatrix) else len(matrix)
     if elements is None:
         elements = [str(i) for i in range(n)]
     
@@ -162,9 +236,13 @@ def print_matrix(matrix: List[List[int]], title: str, elements: List[str] = None
     print()
     
     for i in range(n):
+        if isinstance(matrix, BoolMatrix):
+            row = unpack_rows(matrix.words[i:i + 1], matrix.cols)[0].astype(int)
+        else:
+            row = matrix[i]
         print(f"{elements[i]:3} ", end="")
         for j in range(n):
-            print(f"{matrix[i][j]:3}", end="")
+            print(f"{row[j]:3}", end="")
         print()
 
 
@@ -257,23 +335,17 @@ def main():
     
     closures2 = RelationClosures(matrix2)
     
-    # To make equivalence relation, apply all three closures
-    # First make it reflexive
-    step1 = closures2.reflexive_closure()
-    print_matrix(step1, "Step 1: Reflexive Closure", elements2)
-    
-    # Then make it symmetric
-    closures2_temp = RelationClosures(step1)
-    step2 = closures2_temp.symmetric_closure()
-    print_matrix(step2, "Step 2: + Symmetric Closure", elements2)
+    # Reflexive + symmetric + transitive closure in one union-find pass
+    classes, equivalence = closures2.equivalence_closure()
+    print_matrix(equivalence, "Equivalence Closure", elements2)
     
-    # Finally make it transitive
-    closures2_final = RelationClosures(step2)
-    step3 = closures2_final.transitive_closure()
-    print_matrix(step3, "Step 3: + Transitive Closure (Equivalence Relation)", elements2)
+    print("\nEquivalence classes:")
+    for label in sorted(set(classes)):
+        members = [elements2[i] for i in range(len(classes)) if classes[i] == label]
+        print(f"  [{members[0]}] = {{{', '.join(members)}}}")
     
     # Verify it's an equivalence relation
-    props = closures2_final.check_properties(step3)
+    props = closures2.check_properties(equivalence)
     print(f"\nFinal relation is equivalence relation: {props['equivalence']}")
     
     # Example 3: Partial order
@@ -364,6 +436,7 @@ def main():
             # Also show using matrix powers method
             trans_closure2 = closures.transitive_closure_powers()
             print_matrix(trans_closure2, "Transitive Closure (Matrix Powers Method)", elements)
+            print(f"Converged after {trans_closure2.rounds} squaring rounds")
 
 
 if __name__ == "__main__":
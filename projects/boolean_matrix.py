@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Bit-packed boolean matrix shared by the relation and boolean matrix projects"""
+
+import base64
+from typing import List, Tuple
+
+import numpy as np
+
+WORD_BITS = 64
+WORD_DTYPE = np.dtype('<u8')
+
+# Nonzero words unpacked at a time when listing set bits (64 bytes of bits each)
+NONZERO_WORD_BLOCK = 1 << 16
+
+# Number of set bits in every possible byte value, used to popcount packed words
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def words_per_row(cols: int) -> int:
+    """Number of uint64 words needed to hold a row of `cols` bits"""
+    return (cols + WORD_BITS - 1) // WORD_BITS
+
+
+def pack_rows(matrix) -> np.ndarray:
+    """Pack a 2-D 0/1 array into uint64 words, bit j of a row in word j // 64"""
+    dense = np.asarray(matrix)
+    if dense.ndim != 2:
+        raise ValueError("Matrix must be two-dimensional")
+    rows, cols = dense.shape
+
+    packed = np.packbits(dense != 0, axis=1, bitorder='little')
+    padded = np.zeros((rows, words_per_row(cols) * 8), dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return padded.view(WORD_DTYPE)
+
+
+def unpack_rows(words: np.ndarray, cols: int) -> np.ndarray:
+    """Unpack uint64 row words back into a 2-D bool array with `cols` columns"""
+    words = np.ascontiguousarray(words, dtype=WORD_DTYPE)
+    if cols == 0:
+        return np.zeros((words.shape[0], 0), dtype=bool)
+    as_bytes = words.view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, count=cols, bitorder='little').astype(bool)
+
+
+def popcount_words(words: np.ndarray, axis=None):
+    """Count set bits in packed words (over the whole array or per row with axis=1)"""
+    words = np.ascontiguousarray(words, dtype=WORD_DTYPE)
+    counts = _BYTE_POPCOUNT[words.view(np.uint8)]
+    if axis is None:
+        return int(counts.sum(dtype=np.int64))
+    return counts.sum(axis=axis, dtype=np.int64)
+
+
+def tail_mask(cols: int) -> np.ndarray:
+    """Word mask that keeps the `cols` valid bits of a row and clears the padding"""
+    mask = np.full(words_per_row(cols), np.iinfo(np.uint64).max, dtype=WORD_DTYPE)
+    remainder = cols % WORD_BITS
+    if remainder:
+        mask[-1] = (1 << remainder) - 1
+    return mask
+
+
+def _transpose_bit_blocks(blocks: np.ndarray):
+    """Transpose every 64×64 bit block of a (k × 64) word array in place
+
+    Each step swaps the off-diagonal quadrants of all sub-blocks of width w,
+    exchanging bit j + w of row i with bit j of row i + w, for w = 32 … 1.
+    """
+    width = WORD_BITS // 2
+    while width:
+        mask = np.uint64(sum(((1 << width) - 1) << start for start in range(0, WORD_BITS, 2 * width)))
+        shift = np.uint64(width)
+        pairs = blocks.reshape(len(blocks), WORD_BITS // (2 * width), 2, width)
+        low, high = pairs[:, :, 0], pairs[:, :, 1]
+        swap = ((low >> shift) ^ high) & mask
+        high ^= swap
+        low ^= swap << shift
+        width //= 2
+
+
+class BoolMatrix:
+    """Boolean matrix whose rows are packed into uint64 words
+
+    Padding bits past the last column are always kept at zero, so word-level
+    equality and popcount need no masking.
+    """
+
+    __slots__ = ('words', 'rows', 'cols')
+
+    def __init__(self, words: np.ndarray, rows: int, cols: int):
+        """Wrap an existing (rows × words_per_row(cols)) uint64 word array"""
+        words = np.ascontiguousarray(words, dtype=WORD_DTYPE)
+        if words.shape != (rows, words_per_row(cols)):
+            raise ValueError(f"Word array of shape {words.shape} does not match a {rows}×{cols} matrix")
+        self.words = words
+        self.rows = rows
+        self.cols = cols
+
+    @classmethod
+    def from_dense(cls, matrix) -> 'BoolMatrix':
+        """Pack a nested list or numpy array of 0/1 values"""
+        dense = np.asarray(matrix)
+        words = pack_rows(dense)
+        return cls(words, dense.shape[0], dense.shape[1])
+
+    @classmethod
+    def from_pairs(cls, row_ids, col_ids, shape: Tuple[int, int]) -> 'BoolMatrix':
+        """Set the given (row, column) cells of an empty matrix, without a dense intermediate"""
+        result = cls.zeros(*shape)
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        col_ids = np.asarray(col_ids, dtype=np.int64)
+        np.bitwise_or.at(result.words, (row_ids, col_ids // WORD_BITS),
+                         np.left_shift(np.uint64(1), (col_ids % WORD_BITS).astype(np.uint64)))
+        return result
+
+    @classmethod
+    def coerce(cls, matrix) -> 'BoolMatrix':
+        """Return `matrix` unchanged if already packed, otherwise pack it"""
+        if isinstance(matrix, cls):
+            return matrix
+        return cls.from_dense(matrix)
+
+    @classmethod
+    def zeros(cls, rows: int, cols: int) -> 'BoolMatrix':
+        """Empty relation of the given shape"""
+        return cls(np.zeros((rows, words_per_row(cols)), dtype=WORD_DTYPE), rows, cols)
+
+    @classmethod
+    def identity(cls, n: int) -> 'BoolMatrix':
+        """Identity relation on n elements"""
+        result = cls.zeros(n, n)
+        idx = np.arange(n)
+        result.words[idx, idx // WORD_BITS] = np.left_shift(
+            np.uint64(1), (idx % WORD_BITS).astype(np.uint64))
+        return result
+
+    @classmethod
+    def from_json(cls, payload: dict) -> 'BoolMatrix':
+        """Decode the {'rows', 'cols', 'words'} form produced by to_json"""
+        rows = int(payload['rows'])
+        cols = int(payload['cols'])
+        raw = base64.b64decode(payload['words'])
+        words = np.frombuffer(raw, dtype=WORD_DTYPE).reshape(rows, words_per_row(cols)).copy()
+        words &= tail_mask(cols)
+        return cls(words, rows, cols)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.rows, self.cols)
+
+    def to_dense(self) -> np.ndarray:
+        """Unpack into an int 0/1 numpy array"""
+        return unpack_rows(self.words, self.cols).astype(int)
+
+    def tolist(self) -> List[List[int]]:
+        """Unpack into nested lists of 0/1 ints"""
+        return unpack_rows(self.words, self.cols).view(np.uint8).tolist()
+
+    def to_json(self) -> dict:
+        """Compact JSON form: shape plus base64 of the little-endian words"""
+        return {
+            'rows': self.rows,
+            'cols': self.cols,
+            'words': base64.b64encode(self.words.tobytes()).decode()
+        }
+
+    def copy(self) -> 'BoolMatrix':
+        return BoolMatrix(self.words.copy(), self.rows, self.cols)
+
+    def get(self, i: int, j: int) -> bool:
+        """Test a single cell"""
+        return bool((int(self.words[i, j // WORD_BITS]) >> (j % WORD_BITS)) & 1)
+
+    def diagonal(self) -> np.ndarray:
+        """Bool array of the cells (i, i)"""
+        idx = np.arange(min(self.rows, self.cols))
+        bits = self.words[idx, idx // WORD_BITS] >> (idx % WORD_BITS).astype(np.uint64)
+        return (bits & np.uint64(1)).astype(bool)
+
+    def row_block(self, start: int, stop: int) -> 'BoolMatrix':
+        """Rows start:stop as a BoolMatrix sharing this matrix's words"""
+        words = self.words[start:stop]
+        return BoolMatrix(words, words.shape[0], self.cols)
+
+    def nonzero(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(row, column) indices of the set bits in row-major order, unpacking only nonzero words"""
+        word_rows, word_cols = np.nonzero(self.words)
+        row_parts = [np.zeros(0, dtype=np.int64)]
+        col_parts = [np.zeros(0, dtype=np.int64)]
+        for start in range(0, len(word_rows), NONZERO_WORD_BLOCK):
+            rows = word_rows[start:start + NONZERO_WORD_BLOCK]
+            cols = word_cols[start:start + NONZERO_WORD_BLOCK]
+            bits = np.unpackbits(self.words[rows, cols].view(np.uint8).reshape(-1, 8),
+                                 axis=1, bitorder='little')
+            hit, offset = np.nonzero(bits)
+            row_parts.append(rows[hit])
+            col_parts.append(cols[hit] * WORD_BITS + offset)
+        return np.concatenate(row_parts), np.concatenate(col_parts)
+
+    def row_indices(self, i: int) -> np.ndarray:
+        """Column indices of the set bits in row i"""
+        return np.flatnonzero(unpack_rows(self.words[i:i + 1], self.cols)[0])
+
+    def _check_same_shape(self, other: 'BoolMatrix', operation: str):
+        if not isinstance(other, BoolMatrix):
+            raise TypeError(f"Boolean {operation} requires two BoolMatrix operands")
+        if self.shape != other.shape:
+            raise ValueError(f"Matrices must have the same dimensions for {operation}")
+
+    def __or__(self, other: 'BoolMatrix') -> 'BoolMatrix':
+        self._check_same_shape(other, 'OR')
+        return BoolMatrix(self.words | other.words, self.rows, self.cols)
+
+    def __and__(self, other: 'BoolMatrix') -> 'BoolMatrix':
+        self._check_same_shape(other, 'AND')
+        return BoolMatrix(self.words & other.words, self.rows, self.cols)
+
+    def __xor__(self, other: 'BoolMatrix') -> 'BoolMatrix':
+        self._check_same_shape(other, 'XOR')
+        return BoolMatrix(self.words ^ other.words, self.rows, self.cols)
+
+    def __invert__(self) -> 'BoolMatrix':
+        return BoolMatrix(~self.words & tail_mask(self.cols), self.rows, self.cols)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BoolMatrix):
+            return NotImplemented
+        return self.shape == other.shape and np.array_equal(self.words, other.words)
+
+    def __ne__(self, other) -> bool:
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def transpose(self) -> 'BoolMatrix':
+        """Return Rᵀ, transposing 64×64 bit blocks at word level without unpacking"""
+        row_blocks = words_per_row(self.rows)
+        col_words = self.words.shape[1]
+        padded = np.zeros((row_blocks * WORD_BITS, col_words), dtype=WORD_DTYPE)
+        padded[:self.rows] = self.words
+        # blocks[b, w] holds the 64 row words of row block b in column word w
+        blocks = np.ascontiguousarray(padded.reshape(row_blocks, WORD_BITS, col_words).transpose(0, 2, 1))
+        del padded
+        _transpose_bit_blocks(blocks.reshape(-1, WORD_BITS))
+        # Row t of transposed block (b, w) is word b of output row 64·w + t
+        words = blocks.transpose(1, 2, 0).reshape(col_words * WORD_BITS, row_blocks)[:self.cols]
+        return BoolMatrix(words, self.cols, self.rows)
+
+    @property
+    def T(self) -> 'BoolMatrix':
+        return self.transpose()
+
+    def popcount(self) -> int:
+        """Number of pairs in the relation"""
+        return popcount_words(self.words)
+
+    def row_popcount(self) -> np.ndarray:
+        """Number of set bits in each row (out-degrees)"""
+        return popcount_words(self.words, axis=1)
+
+    def any(self) -> bool:
+        return bool(self.words.any())
+
+    def __repr__(self) -> str:
+        return f"BoolMatrix({self.rows}×{self.cols}, {self.popcount()} set)"
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""Vectorized boolean matrix product engine
+
+The product (A ⊙ B)[i, j] = OR_k (A[i, k] AND B[k, j]) is computed by one of
+several kernels, picked from the operand shapes and the density of A:
+
+- 'matmul':  one float32 BLAS product thresholded at > 0 (small operands)
+- 'blocked': the same BLAS product over cache-sized tiles of A, B and the
+             output, so peak memory stays bounded for large operands
+- 'bitset':  row-OR accumulation, row i of the result is the OR of the packed
+             rows B[k] for every k with A[i, k] = 1 (sparse A)
+- 'm4rm':    Method of Four Russians, A is read 8 columns (one byte) at a time
+             and each byte indexes a precomputed table of the 256 unions of the
+             matching 8 rows of B (dense A)
+- 'sparse':  CSR SpGEMM whose cost follows the number of (i, k, j) paths,
+             used for CSR operands, or when both operands and the expected
+             output are very sparse (see sparse_boolean)
+
+Large products are split into row blocks of A that run on a thread pool;
+every kernel spends its time in numpy calls that release the GIL.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from boolean_matrix import BoolMatrix, pack_rows, unpack_rows, words_per_row, WORD_BITS, WORD_DTYPE
+from sparse_boolean import SparseBoolMatrix, sparse_boolean_product
+
+PRODUCT_METHODS = ('auto', 'matmul', 'blocked', 'bitset', 'm4rm', 'sparse')
+
+# Operands with at most this many m·n·p cell pairs go through a single matmul
+SMALL_PRODUCT_WORK = 256 ** 3
+# Packed or dense operands only go through the CSR product when both are at most
+# this dense and the expected output fill is at most SPARSE_MAX_OUTPUT_FILL; past
+# that bitset is faster (see benchmarks/boolean_product_benchmark.py)
+SPARSE_MAX_DENSITY = 0.01
+SPARSE_MAX_OUTPUT_FILL = 0.005
+# Below this density of A the bitset kernel touches fewer words than BLAS flops
+BITSET_MAX_DENSITY = 0.05
+# Edge length of the square tiles used by the blocked kernel
+DEFAULT_BLOCK_SIZE = 1024
+# Upper bound on gathered words held at once by the bitset and M4RM kernels (~32 MB)
+BITSET_GATHER_WORDS = 1 << 22
+# Rows of B combined per M4RM table; 8 lets the table index be a byte of A
+M4RM_GROUP_BITS = 8
+# Environment variable holding the default number of product threads
+WORKERS_ENV_VAR = 'BOOLEAN_PRODUCT_WORKERS'
+# Smallest row block handed to a worker thread
+MIN_PARALLEL_ROWS = 256
+# Inner dimension up to which M4RM beats the tiled BLAS kernel on dense A
+# (see benchmarks/boolean_product_benchmark.py)
+M4RM_MAX_INNER = 8192
+
+
+def matrix_density(matrix) -> float:
+    """Fraction of set cells in a dense array or BoolMatrix"""
+    rows, cols = matrix.shape
+    if rows == 0 or cols == 0:
+        return 0.0
+    if isinstance(matrix, BoolMatrix):
+        nnz = matrix.popcount()
+    elif isinstance(matrix, SparseBoolMatrix):
+        nnz = matrix.nnz
+    else:
+        nnz = np.count_nonzero(matrix)
+    return nnz / (rows * cols)
+
+
+def expected_fill(inner: int, density_a: float, density_b: float) -> float:
+    """Expected output density of a product with independently placed pairs"""
+    return float(-np.expm1(inner * np.log1p(-density_a * density_b)))
+
+
+def choose_product_method(shape_a, shape_b, density_a: float, density_b: float = 1.0) -> str:
+    """Pick the kernel expected to be fastest for the given shapes and densities"""
+    m, n = shape_a
+    p = shape_b[1]
+    if m * n * p <= SMALL_PRODUCT_WORK:
+        return 'matmul'
+    if (density_a <= SPARSE_MAX_DENSITY and density_b <= SPARSE_MAX_DENSITY
+            and expected_fill(n, density_a, density_b) <= SPARSE_MAX_OUTPUT_FILL):
+        return 'sparse'
+    if density_a <= BITSET_MAX_DENSITY:
+        return 'bitset'
+    if n <= M4RM_MAX_INNER:
+        return 'm4rm'
+    return 'blocked'
+
+
+def resolve_workers(workers=None) -> int:
+    """Number of product threads: explicit value, then the env var, then 1
+
+    Parallelism is opt-in: BLAS inside the matmul kernels is usually
+    multithreaded already, and a pool per request in a threaded server would
+    oversubscribe the cores.
+    """
+    if workers is None:
+        workers = os.environ.get(WORKERS_ENV_VAR) or 1
+    workers = int(workers)
+    if workers < 1:
+        raise ValueError("workers must be a positive integer")
+    return workers
+
+
+def _row_block(matrix, start: int, stop: int):
+    """Rows start:stop of a dense array, BoolMatrix or SparseBoolMatrix"""
+    if isinstance(matrix, (BoolMatrix, SparseBoolMatrix)):
+        return matrix.row_block(start, stop)
+    return matrix[start:stop]
+
+
+def _stack_rows(parts):
+    """Reassemble row blocks produced by the worker threads"""
+    first = parts[0]
+    if isinstance(first, SparseBoolMatrix):
+        return SparseBoolMatrix.vstack(parts)
+    if isinstance(first, BoolMatrix):
+        return BoolMatrix(np.vstack([part.words for part in parts]),
+                          sum(part.rows for part in parts), first.cols)
+    return np.vstack(parts)
+
+
+def _dense_rows(matrix, start: int, stop: int) -> np.ndarray:
+    """Rows start:stop of a dense array or BoolMatrix as a bool array"""
+    if isinstance(matrix, BoolMatrix):
+        return unpack_rows(matrix.words[start:stop], matrix.cols)
+    return np.asarray(matrix[start:stop]) != 0
+
+
+def _as_dense_bool(matrix) -> np.ndarray:
+    if isinstance(matrix, BoolMatrix):
+        return unpack_rows(matrix.words, matrix.cols)
+    return np.asarray(matrix) != 0
+
+
+def _as_words(matrix) -> np.ndarray:
+    if isinstance(matrix, BoolMatrix):
+        return matrix.words
+    return pack_rows(matrix)
+
+
+def matmul_product(A, B) -> np.ndarray:
+    """Single BLAS product of the full operands, returned as a bool array"""
+    a = _as_dense_bool(A).astype(np.float32)
+    b = _as_dense_bool(B).astype(np.float32)
+    return (a @ b) > 0
+
+
+def blocked_product(A, B, block_size: int = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+    """Tiled BLAS product; tile k-loops stop early once an output tile is full"""
+    m, n = A.shape
+    p = B.shape[1]
+    b = _as_dense_bool(B)
+    result = np.zeros((m, p), dtype=bool)
+
+    for i0 in range(0, m, block_size):
+        a_rows = _dense_rows(A, i0, i0 + block_size)
+        for j0 in range(0, p, block_size):
+            out = result[i0:i0 + block_size, j0:j0 + block_size]
+            for k0 in range(0, n, block_size):
+                a_tile = a_rows[:, k0:k0 + block_size]
+                if not a_tile.any():
+                    continue
+                b_tile = b[k0:k0 + block_size, j0:j0 + block_size]
+                out |= (a_tile.astype(np.float32) @ b_tile.astype(np.float32)) > 0
+                if out.all():
+                    break
+    return result
+
+
+def bitset_product_words(A, B) -> np.ndarray:
+    """Row-OR product on packed rows, returned as uint64 result words"""
+    m, n = A.shape
+    p = B.shape[1]
+    b_words = _as_words(B)
+    n_words = words_per_row(p)
+    result = np.zeros((m, n_words), dtype=WORD_DTYPE)
+    if m == 0 or n_words == 0:
+        return result
+
+    # Size row blocks so the gathered B rows of one block stay within budget
+    avg_row_fill = max(1.0, matrix_density(A) * n)
+    block_rows = max(1, int(BITSET_GATHER_WORDS // (avg_row_fill * n_words)))
+
+    for i0 in range(0, m, block_rows):
+        rows, ks = np.nonzero(_dense_rows(A, i0, i0 + block_rows))
+        if len(rows) == 0:
+            continue
+        # np.nonzero is row-major, so each row's entries form one contiguous run
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        result[i0 + rows[starts]] = np.bitwise_or.reduceat(b_words[ks], starts, axis=0)
+    return result
+
+
+def m4rm_tables(b_words: np.ndarray, k0: int) -> np.ndarray:
+    """All 256 unions of rows k0..k0+7 of B, indexed by the byte of A that selects them
+
+    Over GF(2) the table is filled in Gray-code order with one XOR per entry.
+    OR cannot undo a row, so the boolean table is built by doubling instead:
+    entries [2^b, 2^(b+1)) are entries [0, 2^b) OR-ed with row k0 + b.
+    """
+    n_words = b_words.shape[1]
+    table = np.zeros((1 << M4RM_GROUP_BITS, n_words), dtype=WORD_DTYPE)
+    for bit in range(M4RM_GROUP_BITS):
+        k = k0 + bit
+        if k >= b_words.shape[0]:
+            break
+        size = 1 << bit
+        np.bitwise_or(table[:size], b_words[k], out=table[size:2 * size])
+    return table
+
+
+def m4rm_product_words(A, B) -> np.ndarray:
+    """Method of Four Russians product on packed rows, returned as uint64 result words"""
+    m, n = A.shape
+    p = B.shape[1]
+    a_bytes = BoolMatrix.coerce(A).words.view(np.uint8)
+    b_words = _as_words(B)
+    n_words = words_per_row(p)
+    result = np.zeros((m, n_words), dtype=WORD_DTYPE)
+    if m == 0 or n_words == 0:
+        return result
+
+    block_rows = max(1, BITSET_GATHER_WORDS // n_words)
+    for group, k0 in enumerate(range(0, n, M4RM_GROUP_BITS)):
+        selectors = a_bytes[:, group]
+        if not selectors.any():
+            continue
+        table = m4rm_tables(b_words, k0)
+        for i0 in range(0, m, block_rows):
+            result[i0:i0 + block_rows] |= table[selectors[i0:i0 + block_rows]]
+    return result
+
+
+def _kernel_product(A, B, method: str, sparse: bool, packed: bool):
+    """Run one kernel and return the result in the caller's matrix type"""
+    if method == 'sparse':
+        result = sparse_boolean_product(SparseBoolMatrix.coerce(A), SparseBoolMatrix.coerce(B))
+        if sparse:
+            return result
+        if packed:
+            return result.to_bool_matrix()
+        return result.to_dense() != 0
+
+    if method in ('bitset', 'm4rm'):
+        kernel = bitset_product_words if method == 'bitset' else m4rm_product_words
+        result = BoolMatrix(kernel(A, B), A.shape[0], B.shape[1])
+    elif method == 'blocked':
+        result = blocked_product(A, B)
+    else:
+        result = matmul_product(A, B)
+
+    if sparse:
+        return SparseBoolMatrix.from_dense(result)
+    if packed:
+        return BoolMatrix.coerce(result)
+    if isinstance(result, BoolMatrix):
+        return unpack_rows(result.words, result.cols)
+    return result
+
+
+def boolean_product(A, B, method: str = 'auto', workers=None):
+    """Boolean product A ⊙ B
+
+    Accepts dense 0/1 arrays, BoolMatrix or SparseBoolMatrix operands. Returns
+    a SparseBoolMatrix if either operand is sparse, a BoolMatrix if either is
+    packed, otherwise a bool numpy array. `workers` threads (default: the
+    BOOLEAN_PRODUCT_WORKERS env var, else 1) each compute a block
+    of output rows.
+    """
+    if A.shape[1] != B.shape[0]:
+        raise ValueError("Matrix dimensions are not compatible for multiplication")
+    if method not in PRODUCT_METHODS:
+        raise ValueError(f"Unknown product method '{method}', expected one of {PRODUCT_METHODS}")
+
+    sparse = isinstance(A, SparseBoolMatrix) or isinstance(B, SparseBoolMatrix)
+    packed = isinstance(A, BoolMatrix) or isinstance(B, BoolMatrix)
+    if method == 'auto':
+        if sparse:
+            method = 'sparse'
+        else:
+            method = choose_product_method(A.shape, B.shape, matrix_density(A), matrix_density(B))
+
+    # Convert the operands once so worker threads only slice them
+    if method == 'sparse':
+        A = SparseBoolMatrix.coerce(A)
+        B = SparseBoolMatrix.coerce(B)
+    else:
+        if isinstance(A, SparseBoolMatrix):
+            A = A.to_bool_matrix()
+        if isinstance(B, SparseBoolMatrix) or method in ('bitset', 'm4rm'):
+            B = BoolMatrix.coerce(B.to_bool_matrix() if isinstance(B, SparseBoolMatrix) else B)
+        if method == 'm4rm':
+            A = BoolMatrix.coerce(A)
+
+    m = A.shape[0]
+    workers = min(resolve_workers(workers), m // MIN_PARALLEL_ROWS)
+    if workers <= 1:
+        return _kernel_product(A, B, method, sparse, packed)
+
+    bounds = np.linspace(0, m, workers + 1).astype(int)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(
+            lambda start, stop: _kernel_product(_row_block(A, start, stop), B, method, sparse, packed),
+            bounds[:-1], bounds[1:]))
+    return _stack_rows(parts)
+
+
+def boolean_product_with_witness(A, B, workers=None):
+    """Boolean product A ⊙ B together with a witness k for every set cell
+
+    Returns (BoolMatrix product, int64 witness array) where witness[i, j] is
+    the smallest k with A[i, k] = B[k, j] = 1, or -1 when (i, j) is not in
+    the product. The product comes from the fast engine; the witnesses are
+    then peeled off it column by column of A: the rows with A[i, k] = 1
+    claim the still unexplained bits of B[k], and a row drops out as soon as
+    all of its bits have a witness. Every output cell is written once, so
+    dense products finish after a handful of k per row instead of an
+    O(m·n·p) rescan.
+    """
+    if A.shape[1] != B.shape[0]:
+        raise ValueError("Matrix dimensions are not compatible for multiplication")
+    if isinstance(A, SparseBoolMatrix):
+        A = A.to_bool_matrix()
+    if isinstance(B, SparseBoolMatrix):
+        B = B.to_bool_matrix()
+    A = BoolMatrix.coerce(A)
+    B = BoolMatrix.coerce(B)
+    product = boolean_product(A, B, workers=workers)
+    m, n = A.shape
+    p = B.shape[1]
+    a_words = A.words
+    b_words = B.words
+    remaining = product.words.copy()
+    active = remaining.any(axis=1)
+    witness = np.full((m, p), -1, dtype=np.int64)
+
+    for k in range(n):
+        if not active.any():
+            break
+        bit = ((a_words[:, k // WORD_BITS] >> np.uint64(k % WORD_BITS)) & np.uint64(1)).astype(bool)
+        rows = np.flatnonzero(bit & active)
+        if not len(rows) or not b_words[k].any():
+            continue
+        new = b_words[k] & remaining[rows]
+        remaining[rows] &= ~b_words[k]
+        active[rows] = remaining[rows].any(axis=1)
+        row_at, word_at = np.nonzero(new)
+        if not len(row_at):
+            continue
+        bits = np.unpackbits(new[row_at, word_at].view(np.uint8).reshape(-1, 8),
+                             axis=1, bitorder='little')
+        hit, offset = np.nonzero(bits)
+        witness[rows[row_at[hit]], word_at[hit] * WORD_BITS + offset] = k
+    return product, witness
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""Transitive closure engine shared by the relation power and closure projects
+
+- 'warshall': Warshall's algorithm on packed rows. For each pivot k, every
+              row i with R[i, k] = 1 gets row k OR-ed into it; one pivot is a
+              single vectorized operation, O(n³/64) word ops in total.
+- 'scc':      collapse strongly connected components, propagate reachability
+              bitsets over the condensation DAG from the sinks upwards and
+              expand them back to elements. Cost follows the number of pairs
+              and components, which makes it the choice for sparse relations.
+- 'blocked':  three-phase blocked Floyd–Warshall over 64-aligned tiles. For
+              each pivot block K the diagonal tile is closed in-process, then
+              the row/column tiles of K (phase 2) and all remaining row blocks
+              (phase 3) are updated on a process pool that shares the packed
+              words through multiprocessing.shared_memory. Used for large
+              dense relations when at least BLOCKED_MIN_WORKERS processes are
+              configured; the default of one worker keeps it opt-in.
+
+The equivalence closure (reflexive, symmetric and transitive) needs none of
+this: it is the partition into connected components, found by union-find.
+
+IncrementalClosure keeps R⁺ up to date while pairs are inserted, so callers
+that grow a relation do not rerun the full closure after each edit.
+
+transitive_reduction goes the other way: the minimal relation with the same
+closure, i.e. the Hasse diagram when R is a partial order.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from boolean_matrix import BoolMatrix, WORD_BITS, WORD_DTYPE, pack_rows, unpack_rows, words_per_row
+from boolean_product import boolean_product, matrix_density
+from sparse_boolean import SparseBoolMatrix
+
+CLOSURE_METHODS = ('auto', 'warshall', 'scc', 'blocked')
+
+# Relations at most this large always use Warshall
+SMALL_CLOSURE_SIZE = 64
+# Density at or below which the SCC condensation engine is selected
+SCC_MAX_DENSITY = 0.01
+# Component rows expanded to element columns at a time
+EXPAND_ROW_BLOCK = 1024
+# Side of a blocked Floyd–Warshall tile (a multiple of the word size)
+CLOSURE_TILE = 1024
+# Relations at least this large use the blocked engine when enough workers are available;
+# one blocked worker runs about 2× slower than in-place Warshall, so it needs a few to pay off
+BLOCKED_MIN_SIZE = 8192
+BLOCKED_MIN_WORKERS = 4
+# Environment variable holding the default number of blocked closure processes
+CLOSURE_WORKERS_ENV_VAR = 'CLOSURE_WORKERS'
+# Pool processes are started fresh instead of forked: the closure may be called from a
+# multithreaded server, and a forked child can inherit locks held by other threads
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def column_mask(words: np.ndarray, k: int) -> np.ndarray:
+    """Bool array telling which rows have bit k set"""
+    return ((words[:, k // WORD_BITS] >> np.uint64(k % WORD_BITS)) & np.uint64(1)).astype(bool)
+
+
+def warshall_closure_words(words: np.ndarray) -> np.ndarray:
+    """Transitive closure of an n×n relation given as packed rows, updated in place"""
+    n = words.shape[0]
+    for k in range(n):
+        rows = np.flatnonzero(column_mask(words, k))
+        if len(rows):
+            words[rows] |= words[k]
+    return words
+
+
+def strongly_connected_components(graph: SparseBoolMatrix):
+    """Iterative Tarjan; returns (count, labels) with labels in reverse topological order
+
+    Components are numbered as Tarjan completes them, so every edge between
+    two different components goes from a higher label to a lower one.
+    """
+    n = graph.rows
+    indptr = graph.indptr.tolist()
+    indices = graph.indices.tolist()
+    order = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    labels = [-1] * n
+    stack = []
+    counter = 0
+    count = 0
+
+    for root in range(n):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, indptr[root])]
+
+        while work:
+            v, ptr = work[-1]
+            if ptr < indptr[v + 1]:
+                work[-1] = (v, ptr + 1)
+                w = indices[ptr]
+                if order[w] == -1:
+                    order[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, indptr[w]))
+                elif on_stack[w] and order[w] < low[v]:
+                    low[v] = order[w]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == order[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    labels[w] = count
+                    if w == v:
+                        break
+                count += 1
+
+    return count, np.array(labels, dtype=np.int64)
+
+
+def scc_closure(graph: SparseBoolMatrix) -> BoolMatrix:
+    """Transitive closure through the SCC condensation of a CSR relation"""
+    n = graph.rows
+    count, labels = strongly_connected_components(graph)
+    src = labels[graph.row_ids()]
+    dst = labels[graph.indices]
+
+    # A component reaches itself iff it has an internal edge (a cycle or self-loop)
+    cyclic = np.zeros(count, dtype=bool)
+    cyclic[src[src == dst]] = True
+    cross = src != dst
+    condensation = SparseBoolMatrix.from_pairs(src[cross], dst[cross], (count, count))
+
+    # Successors always carry lower labels, so ascending order visits sinks first
+    reach = np.zeros((count, words_per_row(count)), dtype=WORD_DTYPE)
+    one = np.uint64(1)
+    for comp in range(count):
+        succ = condensation.indices[condensation.indptr[comp]:condensation.indptr[comp + 1]]
+        if len(succ):
+            row = np.bitwise_or.reduce(reach[succ], axis=0)
+            np.bitwise_or.at(row, succ // WORD_BITS, one << (succ % WORD_BITS).astype(np.uint64))
+            reach[comp] = row
+    own = np.flatnonzero(cyclic)
+    np.bitwise_or.at(reach, (own, own // WORD_BITS), one << (own % WORD_BITS).astype(np.uint64))
+
+    # Expand component columns to element columns, then component rows to elements
+    component_rows = np.zeros((count, words_per_row(n)), dtype=WORD_DTYPE)
+    for start in range(0, count, EXPAND_ROW_BLOCK):
+        block = unpack_rows(reach[start:start + EXPAND_ROW_BLOCK], count)
+        component_rows[start:start + EXPAND_ROW_BLOCK] = pack_rows(block[:, labels])
+    return BoolMatrix(component_rows[labels], n, n)
+
+
+def _permute_columns(matrix: BoolMatrix, order: np.ndarray) -> BoolMatrix:
+    """Rows of `matrix` with column order[j] moved to position j"""
+    words = np.zeros_like(matrix.words)
+    for start in range(0, matrix.rows, EXPAND_ROW_BLOCK):
+        block = unpack_rows(matrix.words[start:start + EXPAND_ROW_BLOCK], matrix.cols)
+        words[start:start + EXPAND_ROW_BLOCK] = pack_rows(block[:, order])
+    return BoolMatrix(words, matrix.rows, matrix.cols)
+
+
+def transitive_reduction(R) -> np.ndarray:
+    """Covering pairs of an acyclic relation: the Hasse diagram of a partial order
+
+    Self-loops are ignored, so reflexive and strict orders give the same
+    diagram. Returns an (m×2) array of (x, y) pairs sorted by x then y.
+
+    The strict closure S is relabelled in topological order (fewer
+    successors means later), which makes every row strictly upper
+    triangular. For each x, the lowest remaining successor z is always a
+    cover, and everything z reaches is then cleared from x's candidates.
+    A row therefore costs one bitset step per covering pair rather than
+    per successor.
+    """
+    if not isinstance(R, (BoolMatrix, SparseBoolMatrix)):
+        R = BoolMatrix.from_dense(np.asarray(R))
+    if len(R.shape) != 2 or R.shape[0] != R.shape[1]:
+        raise ValueError("Matrix must be square")
+    n = R.shape[0]
+    strict = transitive_closure(R)
+    idx = np.arange(n)
+    strict.words[idx, idx // WORD_BITS] &= ~(np.uint64(1) << (idx % WORD_BITS).astype(np.uint64))
+
+    # In a strict order a successor always has strictly fewer successors
+    order = np.argsort(-strict.row_popcount(), kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = idx
+    ordered = _permute_columns(BoolMatrix(strict.words[order], n, n), order)
+    for start in range(0, n, EXPAND_ROW_BLOCK):
+        block = unpack_rows(ordered.words[start:start + EXPAND_ROW_BLOCK], n)
+        if np.tril(block, k=start).any():
+            raise ValueError("Transitive reduction requires an acyclic relation")
+
+    covers = []
+    words = ordered.words
+    one = np.uint64(1)
+    for x in range(n):
+        remaining = words[x].copy()
+        while True:
+            nonzero = np.flatnonzero(remaining)
+            if not len(nonzero):
+                break
+            w = nonzero[0]
+            word = int(remaining[w])
+            z = w * WORD_BITS + ((word & -word).bit_length() - 1)
+            covers.append((x, z))
+            remaining &= ~words[z]
+            remaining[w] &= ~(one << np.uint64(z % WORD_BITS))
+
+    if not covers:
+        return np.zeros((0, 2), dtype=np.int64)
+    edges = order[np.array(covers, dtype=np.int64)]
+    return edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+
+
+class IncrementalClosure:
+    """Transitive closure maintained under pair insertion (Italiano-style)
+
+    Inserting (a, b) makes b and everything b reaches reachable from a and
+    from every x that already reaches a. Only those rows are touched; each
+    gets b's closure row OR-ed in, which costs O(n²/64) word operations per
+    insert. The insert is a no-op when a already reaches b.
+    """
+
+    __slots__ = ('closure',)
+
+    def __init__(self, R):
+        """Start from a square relation, or from the empty relation on R elements if R is an int"""
+        if isinstance(R, (int, np.integer)):
+            self.closure = BoolMatrix.zeros(R, R)
+        else:
+            if not isinstance(R, (BoolMatrix, SparseBoolMatrix)):
+                R = BoolMatrix.from_dense(np.asarray(R))
+            self.closure = transitive_closure(R)
+
+    @property
+    def size(self) -> int:
+        return self.closure.rows
+
+    def _check_pair(self, a: int, b: int):
+        if not (0 <= a < self.size and 0 <= b < self.size):
+            raise ValueError(f"Pair ({a}, {b}) is out of range for a relation on {self.size} elements")
+
+    def reaches(self, a: int, b: int) -> bool:
+        """(a, b) ∈ R⁺"""
+        self._check_pair(a, b)
+        return self.closure.get(a, b)
+
+    def insert(self, a: int, b: int) -> bool:
+        """Add the pair (a, b); returns False if the closure did not change"""
+        self._check_pair(a, b)
+        words = self.closure.words
+        if self.closure.get(a, b):
+            return False
+        reach_b = words[b].copy()
+        reach_b[b // WORD_BITS] |= np.uint64(1) << np.uint64(b % WORD_BITS)
+        sources = column_mask(words, a)
+        sources[a] = True
+        words[sources] |= reach_b
+        return True
+
+    def insert_many(self, pairs) -> int:
+        """Add a batch of pairs at once; returns the number of pairs added to the closure
+
+        A shortest path in (R⁺ ∪ E) never uses two R⁺ steps in a row, so
+        every intermediate node is an endpoint of a new pair. Warshall with
+        pivots limited to those endpoints therefore restores the closure.
+        """
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        if len(pairs) == 0:
+            return 0
+        if pairs.min() < 0 or pairs.max() >= self.size:
+            raise ValueError(f"Pair index out of range for a relation on {self.size} elements")
+        if len(pairs) == 1:
+            before = self.closure.popcount()
+            self.insert(int(pairs[0, 0]), int(pairs[0, 1]))
+            return self.closure.popcount() - before
+
+        words = self.closure.words
+        before = self.closure.popcount()
+        a, b = pairs[:, 0], pairs[:, 1]
+        np.bitwise_or.at(words, (a, b // WORD_BITS), np.uint64(1) << (b % WORD_BITS).astype(np.uint64))
+        for k in np.unique(pairs):
+            rows = np.flatnonzero(column_mask(words, k))
+            if len(rows):
+                words[rows] |= words[k]
+        return self.closure.popcount() - before
+
+
+class DisjointSet:
+    """Union-find over 0..n-1 with path halving and union by size"""
+
+    __slots__ = ('parent', 'size')
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x: int, y: int) -> bool:
+        """Merge the sets of x and y; returns False if they were already joined"""
+        x, y = self.find(x), self.find(y)
+        if x == y:
+            return False
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+        self.parent[y] = x
+        self.size[x] += self.size[y]
+        return True
+
+
+def equivalence_classes(R) -> np.ndarray:
+    """Class id of every element under the smallest equivalence relation containing R
+
+    Runs union-find over the pairs of R, so the cost is near-linear in the
+    number of pairs. Classes are numbered 0, 1, ... in order of their
+    smallest element.
+    """
+    if not isinstance(R, (BoolMatrix, SparseBoolMatrix)):
+        R = np.asarray(R)
+    if len(R.shape) != 2 or R.shape[0] != R.shape[1]:
+        raise ValueError("Matrix must be square")
+    graph = SparseBoolMatrix.coerce(R)
+    n = graph.rows
+
+    sets = DisjointSet(n)
+    for x, y in zip(graph.row_ids().tolist(), graph.indices.tolist()):
+        sets.union(x, y)
+    roots = np.array([sets.find(x) for x in range(n)], dtype=np.int64)
+
+    # Renumber roots by first appearance so ids do not depend on union order
+    _, first, inverse = np.unique(roots, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    return rank[inverse.reshape(-1)]
+
+
+def equivalence_matrix(labels) -> BoolMatrix:
+    """Relation x ~ y ⟺ labels[x] == labels[y] as a packed matrix"""
+    labels = np.asarray(labels)
+    rows = np.zeros((len(labels), words_per_row(len(labels))), dtype=WORD_DTYPE)
+    for start in range(0, len(labels), EXPAND_ROW_BLOCK):
+        block = labels[start:start + EXPAND_ROW_BLOCK, None] == labels[None, :]
+        rows[start:start + EXPAND_ROW_BLOCK] = pack_rows(block)
+    return BoolMatrix(rows, len(labels), len(labels))
+
+
+# Packed words of the relation being closed, attached once per pool process
+_shared_words = None
+
+
+def _attach_shared_words(name: str, shape):
+    """Pool initializer: map the shared word buffer into this process"""
+    global _shared_words
+    block = shared_memory.SharedMemory(name=name)
+    _shared_words = (block, np.ndarray(shape, dtype=WORD_DTYPE, buffer=block.buf))
+
+
+def _tile_bounds(n: int, tile: int):
+    return [(start, min(start + tile, n)) for start in range(0, n, tile)]
+
+
+def _close_row_tile(words: np.ndarray, pivots, cols):
+    """Phase 2, row part: apply the pivots of block K to the K rows of one word-column tile"""
+    p0, p1 = pivots
+    c0, c1 = cols
+    pivot_rows = words[p0:p1]
+    for k in range(p0, p1):
+        rows = np.flatnonzero(column_mask(pivot_rows, k))
+        if len(rows):
+            words[p0 + rows, c0:c1] |= words[k, c0:c1]
+
+
+def _blocked_task(task, words: np.ndarray):
+    """One phase-2 or phase-3 tile update of blocked Floyd–Warshall"""
+    kind, pivots, target = task
+    p0, p1 = pivots
+    k0, k1 = p0 // WORD_BITS, words_per_row(p1)
+    if kind == 'row':
+        _close_row_tile(words, pivots, target)
+        return
+    t0, t1 = target
+    column = BoolMatrix(words[t0:t1, k0:k1], t1 - t0, p1 - p0)
+    if kind == 'col':
+        # C[I][K] |= C[I][K] · C[K][K]; the diagonal tile is already closed
+        diagonal = BoolMatrix(words[p0:p1, k0:k1], p1 - p0, p1 - p0)
+        words[t0:t1, k0:k1] |= boolean_product(column, diagonal, workers=1).words
+    else:
+        # C[I][:] |= C[I][K] · C[K][:]
+        pivot_rows = BoolMatrix(words[p0:p1], p1 - p0, words.shape[0])
+        words[t0:t1] |= boolean_product(column, pivot_rows, workers=1).words
+
+
+def _shared_task(task):
+    """Pool entry point: run a tile update against the shared words"""
+    _blocked_task(task, _shared_words[1])
+
+
+def _round_tasks(index: int, blocks, word_tiles):
+    """Phase-2 and phase-3 task lists for pivot block `index`"""
+    pivots = blocks[index]
+    phase2 = [('row', pivots, cols) for j, cols in enumerate(word_tiles) if j != index]
+    phase2 += [('col', pivots, rows) for i, rows in enumerate(blocks) if i != index]
+    phase3 = [('rest', pivots, rows) for i, rows in enumerate(blocks) if i != index]
+    return phase2, phase3
+
+
+def blocked_closure_words(words: np.ndarray, workers: int = 1, tile: int = CLOSURE_TILE) -> np.ndarray:
+    """Transitive closure of packed rows by three-phase blocked Floyd–Warshall, in place
+
+    Round K:
+      1. close the diagonal tile C[K][K] with Warshall (in this process)
+      2. row tiles C[K][J]: apply K's pivots to the K rows of each word tile;
+         column tiles C[I][K] |= C[I][K] · C[K][K]
+      3. every other row block I: C[I] |= C[I][K] · C[K]
+    Tasks of one phase write disjoint tiles, so with workers > 1 they run on
+    a process pool that maps the words from shared memory.
+    """
+    if tile % WORD_BITS:
+        raise ValueError(f"Tile size must be a multiple of {WORD_BITS}")
+    n = words.shape[0]
+    blocks = _tile_bounds(n, tile)
+    word_tiles = [(c0 // WORD_BITS, words_per_row(c1)) for c0, c1 in blocks]
+    workers = min(workers, max(len(blocks) - 1, 1))
+
+    if workers <= 1:
+        for index, (p0, p1) in enumerate(blocks):
+            _close_row_tile(words, (p0, p1), word_tiles[index])
+            phase2, phase3 = _round_tasks(index, blocks, word_tiles)
+            for task in phase2 + phase3:
+                _blocked_task(task, words)
+        return words
+
+    block = shared_memory.SharedMemory(create=True, size=words.nbytes)
+    try:
+        shared = np.ndarray(words.shape, dtype=WORD_DTYPE, buffer=block.buf)
+        shared[:] = words
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared_words,
+                                 initargs=(block.name, words.shape),
+                                 mp_context=multiprocessing.get_context(POOL_START_METHOD)) as pool:
+            for index, (p0, p1) in enumerate(blocks):
+                _close_row_tile(shared, (p0, p1), word_tiles[index])
+                phase2, phase3 = _round_tasks(index, blocks, word_tiles)
+                list(pool.map(_shared_task, phase2))
+                list(pool.map(_shared_task, phase3))
+        words[:] = shared
+        del shared
+    finally:
+        block.close()
+        block.unlink()
+    return words
+
+
+def resolve_closure_workers(workers=None) -> int:
+    """Number of blocked closure processes: explicit value, then the env var, then 1"""
+    if workers is None:
+        workers = os.environ.get(CLOSURE_WORKERS_ENV_VAR) or 1
+    workers = int(workers)
+    if workers < 1:
+        raise ValueError("workers must be a positive integer")
+    return workers
+
+
+def choose_closure_method(n: int, density: float, workers: int = 1) -> str:
+    """Warshall for small or dense relations, SCC condensation for sparse ones,
+    the blocked process-pool engine for large dense relations with enough workers"""
+    if n > SMALL_CLOSURE_SIZE and density <= SCC_MAX_DENSITY:
+        return 'scc'
+    if n >= BLOCKED_MIN_SIZE and workers >= BLOCKED_MIN_WORKERS:
+        return 'blocked'
+    return 'warshall'
+
+
+def transitive_closure(R, method: str = 'auto', workers=None):
+    """Transitive closure R⁺ of a square relation
+
+    Accepts nested lists, numpy arrays, BoolMatrix or SparseBoolMatrix.
+    Returns a BoolMatrix for packed or sparse input (closures of sparse
+    relations are rarely sparse), otherwise an int 0/1 numpy array.
+    `workers` (default: the CLOSURE_WORKERS env var, else 1) is the process
+    count of the blocked engine, which 'auto' only picks with several.
+    """
+    if method not in CLOSURE_METHODS:
+        raise ValueError(f"Unknown closure method '{method}', expected one of {CLOSURE_METHODS}")
+    packed = isinstance(R, (BoolMatrix, SparseBoolMatrix))
+    if not packed:
+        R = np.asarray(R)
+    if len(R.shape) != 2 or R.shape[0] != R.shape[1]:
+        raise ValueError("Matrix must be square")
+
+    workers = resolve_closure_workers(workers)
+    if method == 'auto':
+        method = choose_closure_method(R.shape[0], matrix_density(R), workers)
+
+    if method == 'scc':
+        result = scc_closure(SparseBoolMatrix.coerce(R))
+    else:
+        if isinstance(R, SparseBoolMatrix):
+            result = R.to_bool_matrix()
+        elif isinstance(R, BoolMatrix):
+            result = R.copy()
+        else:
+            result = BoolMatrix.from_dense(R)
+        if method == 'blocked':
+            blocked_closure_words(result.words, workers)
+        else:
+            warshall_closure_words(result.words)
+
+    if packed:
+        return result
+    return result.to_dense()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""CSR boolean matrices and a sparse boolean product (SpGEMM)
+
+Row i of A ⊙ B is the union of the adjacency rows B[k] for every k in A[i],
+so the work is proportional to the number of (i, k, j) paths rather than to
+m·n·p. Each block of rows is deduplicated either with a dense bool
+accumulator (rows that fill a large part of the output) or with a
+sort-based unique-key accumulator (rows that touch only a few columns).
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from boolean_matrix import BoolMatrix
+
+INDEX_DTYPE = np.int64
+
+# Upper bound on expanded (i, j) candidates materialized per row block
+SPGEMM_WORK_BUDGET = 1 << 22
+# Candidates per output cell above which the dense accumulator is used
+DENSE_ACCUMULATOR_FILL = 1 / 16
+# Largest dense accumulator block (rows × cols) we are willing to allocate
+DENSE_ACCUMULATOR_CELLS = 1 << 24
+
+
+class SparseBoolMatrix:
+    """Boolean matrix in compressed sparse row form (indptr, sorted column indices)"""
+
+    __slots__ = ('indptr', 'indices', 'rows', 'cols')
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, rows: int, cols: int):
+        """Wrap CSR arrays; column indices must be sorted and unique within each row"""
+        self.indptr = np.asarray(indptr, dtype=INDEX_DTYPE)
+        self.indices = np.asarray(indices, dtype=INDEX_DTYPE)
+        if len(self.indptr) != rows + 1:
+            raise ValueError(f"indptr must have {rows + 1} entries for {rows} rows")
+        self.rows = rows
+        self.cols = cols
+
+    @classmethod
+    def from_pairs(cls, row_ids, col_ids, shape: Tuple[int, int]) -> 'SparseBoolMatrix':
+        """Build from parallel arrays of (row, column) pairs; duplicates are merged"""
+        rows, cols = shape
+        row_ids = np.asarray(row_ids, dtype=INDEX_DTYPE)
+        col_ids = np.asarray(col_ids, dtype=INDEX_DTYPE)
+        if len(row_ids) and (row_ids.min() < 0 or row_ids.max() >= rows
+                             or col_ids.min() < 0 or col_ids.max() >= cols):
+            raise ValueError(f"Pair index out of range for a {rows}×{cols} relation")
+        if cols:
+            row_ids, col_ids = np.divmod(np.unique(row_ids * cols + col_ids), cols)
+        indptr = np.zeros(rows + 1, dtype=INDEX_DTYPE)
+        np.cumsum(np.bincount(row_ids, minlength=rows), out=indptr[1:])
+        return cls(indptr, col_ids, rows, cols)
+
+    @classmethod
+    def from_dense(cls, matrix) -> 'SparseBoolMatrix':
+        """Convert a nested list, numpy array or BoolMatrix"""
+        if isinstance(matrix, BoolMatrix):
+            # Set bits come out row-major and unique, which is already CSR order
+            row_ids, col_ids = matrix.nonzero()
+            indptr = np.zeros(matrix.rows + 1, dtype=INDEX_DTYPE)
+            np.cumsum(np.bincount(row_ids, minlength=matrix.rows), out=indptr[1:])
+            return cls(indptr, col_ids, matrix.rows, matrix.cols)
+        dense = np.asarray(matrix)
+        row_ids, col_ids = np.nonzero(dense)
+        return cls.from_pairs(row_ids, col_ids, dense.shape)
+
+    @classmethod
+    def coerce(cls, matrix) -> 'SparseBoolMatrix':
+        if isinstance(matrix, cls):
+            return matrix
+        return cls.from_dense(matrix)
+
+    @classmethod
+    def vstack(cls, blocks: List['SparseBoolMatrix']) -> 'SparseBoolMatrix':
+        """Stack row blocks that share the same column count"""
+        lengths = np.concatenate([block.row_lengths() for block in blocks])
+        indptr = np.zeros(len(lengths) + 1, dtype=INDEX_DTYPE)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.concatenate([block.indices for block in blocks])
+        return cls(indptr, indices, len(lengths), blocks[0].cols)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.rows, self.cols)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1])
+
+    def density(self) -> float:
+        cells = self.rows * self.cols
+        return self.nnz / cells if cells else 0.0
+
+    def row_lengths(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def row_block(self, start: int, stop: int) -> 'SparseBoolMatrix':
+        """Rows start:stop as a SparseBoolMatrix sharing this matrix's indices"""
+        stop = min(stop, self.rows)
+        indptr = self.indptr[start:stop + 1]
+        indices = self.indices[indptr[0]:indptr[-1]]
+        return SparseBoolMatrix(indptr - indptr[0], indices, stop - start, self.cols)
+
+    def row_ids(self) -> np.ndarray:
+        """Row index of every stored entry"""
+        return np.repeat(np.arange(self.rows, dtype=INDEX_DTYPE), self.row_lengths())
+
+    def pairs(self) -> List[Tuple[int, int]]:
+        """Ordered (row, column) pairs of the relation"""
+        return list(zip(self.row_ids().tolist(), self.indices.tolist()))
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.shape, dtype=int)
+        dense[self.row_ids(), self.indices] = 1
+        return dense
+
+    def to_bool_matrix(self) -> BoolMatrix:
+        return BoolMatrix.from_pairs(self.row_ids(), self.indices, self.shape)
+
+    def tolist(self) -> List[List[int]]:
+        return self.to_dense().tolist()
+
+    def __repr__(self) -> str:
+        return f"SparseBoolMatrix({self.rows}×{self.cols}, nnz={self.nnz})"
+
+
+def product_work(A: SparseBoolMatrix, B: SparseBoolMatrix) -> np.ndarray:
+    """Number of expanded (i, k, j) candidates contributed by each row of A"""
+    per_entry = B.row_lengths()[A.indices]
+    return np.bincount(A.row_ids(), weights=per_entry, minlength=A.rows).astype(INDEX_DTYPE)
+
+
+def _row_blocks(work: np.ndarray, budget: int):
+    """Split rows into contiguous blocks whose total work stays near `budget`"""
+    cumulative = np.cumsum(work)
+    start = 0
+    while start < len(work):
+        base = cumulative[start - 1] if start else 0
+        stop = int(np.searchsorted(cumulative, base + budget, side='right'))
+        stop = max(stop, start + 1)
+        yield start, stop
+        start = stop
+
+
+def sparse_boolean_product(A: SparseBoolMatrix, B: SparseBoolMatrix) -> SparseBoolMatrix:
+    """Output-sensitive boolean product of two CSR matrices"""
+    if A.cols != B.rows:
+        raise ValueError("Matrix dimensions are not compatible for multiplication")
+    m, p = A.rows, B.cols
+    b_lengths = B.row_lengths()
+    work = product_work(A, B)
+
+    row_counts = np.zeros(m, dtype=INDEX_DTYPE)
+    col_chunks = []
+    for i0, i1 in _row_blocks(work, SPGEMM_WORK_BUDGET):
+        total = int(work[i0:i1].sum())
+        if total == 0:
+            continue
+        s0, s1 = A.indptr[i0], A.indptr[i1]
+        ks = A.indices[s0:s1]
+        owners = np.repeat(np.arange(i1 - i0, dtype=INDEX_DTYPE), np.diff(A.indptr[i0:i1 + 1]))
+
+        # Expand every A[i, k] into the column list of B[k]
+        lengths = b_lengths[ks]
+        segment_starts = np.cumsum(lengths) - lengths
+        offsets = np.arange(total, dtype=INDEX_DTYPE) - np.repeat(segment_starts, lengths)
+        cols = B.indices[np.repeat(B.indptr[ks], lengths) + offsets]
+        rows = np.repeat(owners, lengths)
+
+        block_cells = (i1 - i0) * p
+        if total >= block_cells * DENSE_ACCUMULATOR_FILL and block_cells <= DENSE_ACCUMULATOR_CELLS:
+            accumulator = np.zeros((i1 - i0, p), dtype=bool)
+            accumulator[rows, cols] = True
+            rows, cols = np.nonzero(accumulator)
+        else:
+            rows, cols = np.divmod(np.unique(rows * p + cols), p)
+
+        row_counts[i0:i1] = np.bincount(rows, minlength=i1 - i0)
+        col_chunks.append(cols.astype(INDEX_DTYPE))
+
+    indptr = np.zeros(m + 1, dtype=INDEX_DTYPE)
+    np.cumsum(row_counts, out=indptr[1:])
+    indices = np.concatenate(col_chunks) if col_chunks else np.zeros(0, dtype=INDEX_DTYPE)
+    return SparseBoolMatrix(indptr, indices, m, p)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Blocked transitivity check R·R ⊆ R on packed relations
+
+R·R is never materialized: it is computed a block of rows at a time,
+compared with the same rows of R, and the scan stops at the first block
+containing a pair of R·R that is missing from R. The product kernel is
+chosen and R converted for it once, not once per block.
+"""
+
+from boolean_matrix import BoolMatrix
+from boolean_product import boolean_product, choose_product_method, matrix_density
+from sparse_boolean import SparseBoolMatrix
+
+# Rows of R·R compared against R per step of the transitivity check
+TRANSITIVITY_ROW_BLOCK = 1024
+
+
+def block_product_operand(P: BoolMatrix, row_block: int = TRANSITIVITY_ROW_BLOCK):
+    """(method, operand) for repeated products of row blocks with P, picked from P's density"""
+    density = matrix_density(P)
+    method = choose_product_method((min(row_block, P.rows), P.rows), P.shape, density, density)
+    # The tiled BLAS kernel would unpack all of P for every block; M4RM stays on packed words
+    if method == 'blocked':
+        return 'm4rm', P
+    if method == 'sparse':
+        return method, SparseBoolMatrix.coerce(P)
+    return method, P
+
+
+def block_product(rows: BoolMatrix, method: str, operand) -> BoolMatrix:
+    """rows · P as a packed matrix, with P prepared by block_product_operand"""
+    if method == 'sparse':
+        return boolean_product(SparseBoolMatrix.coerce(rows), operand).to_bool_matrix()
+    return boolean_product(rows, operand, method)
+
+
+def first_intransitive_block(P: BoolMatrix, row_block: int = TRANSITIVITY_ROW_BLOCK):
+    """Start row of the first block of R·R with a pair missing from R, or None if R is transitive"""
+    method, operand = block_product_operand(P, row_block)
+    for start in range(0, P.rows, row_block):
+        rows = P.row_block(start, start + row_block)
+        if (block_product(rows, method, operand) & ~rows).any():
+            return start
+    return None
+
+
+def is_transitive_packed(P: BoolMatrix, row_block: int = TRANSITIVITY_ROW_BLOCK) -> bool:
+    """R·R ⊆ R on a packed relation, checked block by block and stopping at the first violation"""
+    return first_intransitive_block(P, row_block) is None
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects'))
+from boolean_matrix import BoolMatrix
+from closure_engine import blocked_closure_words, transitive_closure, warshall_closure_words
+from sparse_boolean import SparseBoolMatrix
+
+
+def random_relation(n, density, seed):
+    return np.random.default_rng(seed).random((n, n)) < density
+
+
+def reference_closure(matrix):
+    closure = matrix.copy()
+    while True:
+        step = closure | ((closure.astype(np.int64) @ matrix.astype(np.int64)) > 0)
+        if (step == closure).all():
+            return closure
+        closure = step
+
+
+def test_warshall_matches_reference():
+    matrix = random_relation(70, 0.03, 0)
+    words = BoolMatrix.from_dense(matrix).words.copy()
+    closed = BoolMatrix(warshall_closure_words(words), 70, 70)
+    assert (closed.to_dense() == reference_closure(matrix)).all()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('n, density, seed', [(150, 0.01, 1), (200, 0.02, 2), (130, 0.3, 3)])
+def test_blocked_closure_matches_warshall(workers, n, density, seed):
+    packed = BoolMatrix.from_dense(random_relation(n, density, seed))
+    expected = warshall_closure_words(packed.words.copy())
+    blocked = blocked_closure_words(packed.words.copy(), workers=workers, tile=64)
+    assert np.array_equal(blocked, expected)
+
+
+def test_blocked_closure_rejects_unaligned_tile():
+    with pytest.raises(ValueError):
+        blocked_closure_words(BoolMatrix.zeros(10, 10).words, tile=100)
+
+
+@pytest.mark.parametrize('n, density, seed', [(1, 0.5, 4), (97, 0.01, 5), (300, 0.005, 6), (120, 0.1, 7)])
+def test_scc_closure_matches_warshall(n, density, seed):
+    matrix = random_relation(n, density, seed)
+    expected = transitive_closure(BoolMatrix.from_dense(matrix), method='warshall')
+    assert transitive_closure(BoolMatrix.from_dense(matrix), method='scc') == expected
+    assert transitive_closure(SparseBoolMatrix.from_dense(matrix), method='scc') == expected
+    assert (transitive_closure(matrix.astype(int), method='scc') == expected.to_dense()).all()
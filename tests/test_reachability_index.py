@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects'))
+from boolean_matrix import BoolMatrix
+from closure_engine import transitive_closure
+from reachability_index import ReachabilityIndex
+
+
+@pytest.mark.parametrize('n, density, seed', [(1, 0.0, 0), (1, 1.0, 1), (40, 0.03, 2),
+                                              (80, 0.02, 3), (60, 0.1, 4), (120, 0.01, 5)])
+def test_reaches_matches_closure(n, density, seed):
+    matrix = np.random.default_rng(seed).random((n, n)) < density
+    closure = transitive_closure(BoolMatrix.from_dense(matrix), method='warshall').to_dense()
+    index = ReachabilityIndex(matrix)
+    for a in range(n):
+        for b in range(n):
+            assert index.reaches(a, b, reflexive=False) == closure[a, b]
+            assert index.reaches(a, b) == (closure[a, b] or a == b)
+
+
+def test_query_batch_and_bounds():
+    index = ReachabilityIndex([[0, 1, 0], [0, 0, 1], [0, 0, 0]])
+    assert index.query([(0, 2), (2, 0), (1, 1)]) == [True, False, True]
+    assert index.query([(1, 1)], reflexive=False) == [False]
+    with pytest.raises(ValueError):
+        index.reaches(0, 3)
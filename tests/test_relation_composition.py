@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects',
+                             '10_relation_composition'))
+from relation_composition import PairRelation
+
+
+def test_compose_mixed_type_labels():
+    R = PairRelation.from_pairs([('a', 1), ('b', 'k')])
+    S = PairRelation.from_pairs([(1, 'x')])
+    assert R.compose(S).pairs() == [('a', 'x')]
+
+
+def test_int_and_str_labels_stay_distinct():
+    R = PairRelation.from_pairs([('a', 1), ('b', '2')])
+    assert R.pairs() == [('a', 1), ('b', '2')]
+
+    R = PairRelation.from_pairs([('i', 1), ('s', '1')])
+    S = PairRelation.from_pairs([(1, 'int'), ('1', 'str')])
+    assert R.compose(S).pairs() == [('i', 'int'), ('s', 'str')]
+
+
+def test_none_and_tuple_labels():
+    R = PairRelation.from_pairs([(None, (1, 2)), ('x', None)])
+    S = PairRelation.from_pairs([((1, 2), 3.5), (None, 'n')])
+    assert R.compose(S).pairs() == [(None, 3.5), ('x', 'n')]
+
+
+def test_unknown_label_in_given_domain():
+    with pytest.raises(ValueError):
+        PairRelation.from_pairs([('a', 1)], domain=['a'], codomain=['1'])
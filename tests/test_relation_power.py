@@ -0,0 +1,58 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects',
+                             '5_relation_power'))
+from relation_power import RelationPowerSequence
+
+
+def brute_force_powers(matrix, steps):
+    powers = [matrix]
+    for _ in range(steps - 1):
+        powers.append((powers[-1].astype(np.int64) @ matrix.astype(np.int64)) > 0)
+    return powers
+
+
+def brute_force_index_period(matrix):
+    # Boolean powers repeat within n² + n steps, so 2n² + 2 powers always contain the cycle
+    n = matrix.shape[0]
+    powers = brute_force_powers(matrix, 2 * n * n + 2)
+    seen = {}
+    for k, power in enumerate(powers, start=1):
+        key = power.tobytes()
+        if key in seen:
+            return seen[key], k - seen[key]
+        seen[key] = k
+    raise AssertionError("no repetition found")
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_index_and_period_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 9))
+    matrix = rng.random((n, n)) < rng.uniform(0.05, 0.5)
+    sequence = RelationPowerSequence(matrix)
+    assert (sequence.index, sequence.period) == brute_force_index_period(matrix)
+
+
+def test_cycle_with_tail():
+    # 0 → 1 → 2 → 3 → 4 → 2: tail of length 2 into a 3-cycle
+    matrix = np.zeros((5, 5), dtype=bool)
+    for a, b in [(0, 1), (1, 2), (2, 3), (3, 4), (4, 2)]:
+        matrix[a, b] = True
+    sequence = RelationPowerSequence(matrix)
+    assert (sequence.index, sequence.period) == brute_force_index_period(matrix)
+    assert sequence.period == 3
+
+
+def test_power_matches_brute_force():
+    matrix = np.random.default_rng(99).random((7, 7)) < 0.2
+    sequence = RelationPowerSequence(matrix)
+    powers = brute_force_powers(matrix, 60)
+    for n in range(1, 61):
+        assert (sequence.power(n).to_dense() == powers[n - 1]).all()
+    with pytest.raises(ValueError):
+        sequence.power(0)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'projects',
+                             '6_relation_properties'))
+from relation_properties import RelationPropertyTracker, analyze_relation
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_tracker_matches_analyze_relation(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 9))
+    tracker = RelationPropertyTracker(rng.random((n, n)) < 0.3)
+    for _ in range(200):
+        a, b = (int(x) for x in rng.integers(0, n, 2))
+        if rng.random() < 0.5:
+            tracker.add(a, b)
+        else:
+            tracker.remove(a, b)
+        assert tracker.properties() == analyze_relation(tracker.matrix.astype(int))
+
+
+def test_tracker_reports_unchanged_edits():
+    tracker = RelationPropertyTracker(3)
+    assert tracker.add(0, 1)
+    assert not tracker.add(0, 1)
+    assert tracker.remove(0, 1)
+    assert not tracker.remove(0, 1)
+
+
+@pytest.mark.parametrize('pair', [(3, 0), (0, 3), (-1, 0), (0, -1)])
+def test_tracker_rejects_out_of_range_pairs(pair):
+    tracker = RelationPropertyTracker(3)
+    with pytest.raises(ValueError):
+        tracker.add(*pair)
+    with pytest.raises(ValueError):
+        tracker.remove(*pair)
+    assert tracker.pairs == 0 and not tracker.matrix.any()